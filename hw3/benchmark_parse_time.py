@@ -0,0 +1,69 @@
+"""Micro-benchmark of parse_time against datetime.strptime
+
+Run it with ``python3.4 benchmark_parse_time.py``.
+
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from observation import TIME_FORMAT, parse_time
+
+
+def random_times(count, distinct):
+    """Makes a list of observation times
+
+    :param int count: How many times to make
+
+    :param int distinct: How many different times to pick from
+
+    :return: A list of time strings in TIME_FORMAT
+    """
+    start = datetime(2016, 1, 1)
+    choices = [str(start + timedelta(seconds=random.randint(0, 10 ** 8)))
+               for _ in range(distinct)]
+    return [random.choice(choices) for _ in range(count)]
+
+
+def main(args):
+    """Times each way of parsing and prints the results
+
+    :param argparse.Namespace args: A Namespace that contains parsed
+        command line arguments.
+
+    :returns: Nothing
+    """
+    for distinct in (args.count, args.count // 100):
+        times = random_times(args.count, distinct)
+
+        def with_strptime():
+            for time in times:
+                datetime.strptime(time, TIME_FORMAT)
+
+        def with_parse_time():
+            parse_time.cache_clear()
+            for time in times:
+                parse_time(time)
+
+        def without_cache():
+            for time in times:
+                parse_time.__wrapped__(time)
+
+        print(str(args.count) + " times, " + str(distinct) + " distinct:")
+        for name, function in (("strptime", with_strptime),
+                               ("parse_time", with_parse_time),
+                               ("parse_time (no cache)", without_cache)):
+            best = min(timeit.repeat(function, number=1, repeat=args.repeat))
+            print("    {:<22} {:8.1f} ns/time".format(
+                name, best / args.count * 1e9))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare parse_time with datetime.strptime.')
+    parser.add_argument('--count', type=int, default=100000,
+                        help='How many times to parse per run')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='How many runs to take the best of')
+    main(parser.parse_args())
@@ -0,0 +1,259 @@
+"""Benchmarks of each stage of the tracker on synthetic observations
+
+Run it with ``python3.4 benchmark_tracker.py``. The results are
+written to a JSON file, so that runs can be compared over time.
+
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from main import load_timeline
+from observation import Observation, parse_time
+from observation_timeline import DataError, ObservationTimeline
+from ownership import Ownership
+
+
+def synthetic_rows(count, suspects=1000, locations=10000, density=100.0,
+                   rate=0.1, seed=0):
+    """Makes rows of an observations CSV file
+
+    Observations come one after another, on average 1 / density hours
+    apart. Each one is either on its own or, with chance rate, the
+    first half of a rendezvous: someone else turns up at the same
+    location a few minutes later. Locations that were used in the last
+    two hours are avoided where possible, so that windows don't end up
+    with too many observations.
+
+    :param int count: How many rows to make
+
+    :param int suspects: How many different suspects to pick from
+
+    :param int locations: How many different locations to pick from
+
+    :param float density: Observations per hour
+
+    :param float rate: Chance of an observation starting a rendezvous
+
+    :param int seed: Seed for the random numbers, so that runs with the
+        same arguments get the same rows
+
+    :return: A list of (name, location, time, item) tuples, in time
+        order. Each suspect carries an item on their first row.
+    """
+    rng = random.Random(seed)
+    start = datetime(2016, 1, 1)
+    gap = 3600 / density
+    seconds = 0.0
+    # When each location was last used
+    used = {}
+    seen = set()
+    rows = []
+
+    def row(name, location, at):
+        item = ''
+        if name not in seen:
+            seen.add(name)
+            item = 'item ' + name
+        rows.append((name, location,
+                     str(start + timedelta(seconds=int(at))), item))
+
+    while len(rows) < count:
+        seconds += rng.expovariate(1 / gap)
+        for _ in range(8):
+            location = 'L' + str(rng.randrange(locations))
+            if used.get(location, -7200) <= seconds - 7200:
+                break
+        used[location] = seconds
+        first = 'S' + str(rng.randrange(suspects))
+        row(first, location, seconds)
+        if rng.random() < rate and len(rows) < count:
+            second = first
+            while second == first and suspects > 1:
+                second = 'S' + str(rng.randrange(suspects))
+            row(second, location, seconds + rng.randint(60, 1800))
+    return rows
+
+
+def best_time(function, setup, repeat):
+    """Times a function, taking the best of several runs
+
+    :param function: Called with whatever setup returns
+
+    :param setup: Called before each run, and not timed
+
+    :param int repeat: How many runs to take the best of
+
+    :return: The fastest run, in seconds
+
+    :rtype: float
+    """
+    best = None
+    for _ in range(repeat):
+        argument = setup()
+        before = time.perf_counter()
+        function(argument)
+        taken = time.perf_counter() - before
+        best = taken if best is None else min(best, taken)
+    return best
+
+
+def consume(iterable):
+    """Runs through an iterable, up to any DataError
+
+    :param iterable iterable: What to run through
+
+    :return: How many values it gave
+
+    :rtype: int
+    """
+    count = 0
+    try:
+        for _ in iterable:
+            count += 1
+    except DataError:
+        pass
+    return count
+
+
+def benchmark(count, args, directory):
+    """Times each stage of the tracker for one number of observations
+
+    :param int count: How many observations to use
+
+    :param argparse.Namespace args: The parsed command line arguments
+
+    :param str directory: Where to write the CSV file
+
+    :return: A list of result dictionaries, one per stage
+
+    :rtype: list
+    """
+    rows = synthetic_rows(count, args.suspects, args.locations,
+                          args.density, args.rate, args.seed)
+    filename = os.path.join(directory, str(count) + '.csv')
+    with open(filename, 'w') as f:
+        f.writelines(','.join(row) + '\n' for row in rows)
+
+    observations = [Observation(name, location, time)
+                    for name, location, time, _ in rows]
+    shuffled = list(observations)
+    random.Random(args.seed).shuffle(shuffled)
+    carrying = {name: item for name, _, _, item in rows if item}
+    timeline = ObservationTimeline.from_iterable(observations)
+    rendezvous = []
+    try:
+        for rend in timeline.rendezvous():
+            rendezvous.append(rend)
+    except DataError:
+        pass
+
+    def construct(_):
+        for name, location, time_string, _ in rows:
+            Observation(name, location, time_string)
+
+    def add(timeline):
+        for o in shuffled:
+            timeline.add(o)
+
+    def replay(ownership):
+        for first, second in rendezvous:
+            ownership.exchange(first, second)
+
+    def cold():
+        # Times parsed by an earlier run would otherwise be cache hits,
+        # which a real run only gets for repeated times
+        parse_time.cache_clear()
+
+    stages = [
+        ('Observation', construct, cold),
+        ('ObservationTimeline.add', add, ObservationTimeline),
+        ('ObservationTimeline.add_many',
+         lambda t: t.add_many(shuffled), ObservationTimeline),
+        ('windows', lambda t: consume(t.windows()), lambda: timeline),
+        ('rendezvous', lambda t: consume(t.rendezvous()), lambda: timeline),
+        ('load_timeline', lambda _: load_timeline(filename), cold),
+        ('exchange replay', replay, lambda: Ownership(dict(carrying))),
+    ]
+    results = []
+    for stage, function, setup in stages:
+        if args.stage and stage not in args.stage:
+            continue
+        # Adding one at a time shifts the list each time, so big sizes
+        # would take hours
+        if stage == 'ObservationTimeline.add' and count > args.max_add:
+            continue
+        seconds = best_time(function, setup, args.repeat)
+        results.append({'stage': stage, 'observations': count,
+                        'rendezvous': len(rendezvous), 'seconds': seconds,
+                        'ns_per_observation': seconds / count * 1e9})
+        print("{:>10} {:<30} {:10.4f} s {:10.1f} ns/observation".format(
+            count, stage, seconds, seconds / count * 1e9))
+    os.remove(filename)
+    return results
+
+
+def main(args):
+    """Runs the benchmarks and writes the results out
+
+    :param argparse.Namespace args: A Namespace that contains parsed
+        command line arguments.
+
+    :returns: Nothing
+    """
+    results = []
+    directory = tempfile.mkdtemp()
+    try:
+        for count in args.sizes:
+            results += benchmark(count, args, directory)
+    finally:
+        shutil.rmtree(directory)
+
+    settings = {name: getattr(args, name) for name in
+                ('suspects', 'locations', 'density', 'rate', 'seed',
+                 'repeat')}
+    with open(args.output, 'w') as f:
+        json.dump({'date': datetime.now().isoformat(),
+                   'python': sys.version,
+                   'platform': platform.platform(),
+                   'settings': settings,
+                   'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time each stage of the tracker on synthetic '
+        'observations.')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000],
+                        help='How many observations to time with '
+                        '(up to 10000000)')
+    parser.add_argument('--suspects', type=int, default=1000,
+                        help='How many different suspects there are')
+    parser.add_argument('--locations', type=int, default=10000,
+                        help='How many different locations there are')
+    parser.add_argument('--density', type=float, default=100.0,
+                        help='How many observations there are per hour')
+    parser.add_argument('--rate', type=float, default=0.1,
+                        help='Chance of an observation starting a '
+                        'rendezvous')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for the synthetic observations')
+    parser.add_argument('--stage', action='append', default=[],
+                        help='Only time this stage. Can be given more '
+                        'than once.')
+    parser.add_argument('--max-add', type=int, default=1000000,
+                        help='Skip ObservationTimeline.add for sizes '
+                        'bigger than this')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='How many runs to take the best of')
+    parser.add_argument('--output', default='benchmark.json',
+                        help='The JSON file to write the results to')
+    main(parser.parse_args())
@@ -0,0 +1,420 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from itertools import compress, islice
+from operator import and_, eq, sub
+
+from observation import Observation, time_key
+from observation_timeline import DataError, count_windows
+
+
+class ColumnarTimeline:
+    def __init__(self):
+        """Constructor for a ColumnarTimeline
+
+        Works like an ObservationTimeline, but keeps each column of
+        the observations in its own compact array instead of keeping
+        an Observation object around for each one. Names and locations
+        are stored as integer codes into tables of strings.
+
+        :return: None
+        """
+        # Time keys, name codes and location codes, in time order
+        self._times = array('q')
+        self._names = array('i')
+        self._locations = array('i')
+        # The strings behind the codes, and the codes for each string
+        self.name_table = []
+        self.location_table = []
+        self._name_codes = {}
+        self._location_codes = {}
+        # Maps each name code to that suspect's time keys and location
+        # codes, in time order. Only built when it's first needed.
+        self._suspects = None
+
+    @classmethod
+    def from_iterable(cls, observations):
+        """Builds a ColumnarTimeline from many observations at once
+
+        :param iterable observations: Observations in any order
+
+        :return: A new timeline holding the observations
+
+        :rtype: ColumnarTimeline
+        """
+        timeline = cls()
+        timeline.add_many(observations)
+        return timeline
+
+    @classmethod
+    def from_columns(cls, times, names, locations, name_table,
+                     location_table):
+        """Builds a ColumnarTimeline around existing columns
+
+        The columns can be any sequences of integers, such as
+        memoryviews of a memory-mapped file. They are only copied if
+        more observations are added.
+
+        :param times: Time keys, in time order
+
+        :param names: Name codes, in the same order
+
+        :param locations: Location codes, in the same order
+
+        :param list name_table: The name for each name code
+
+        :param list location_table: The location for each location code
+
+        :return: A new timeline holding the columns
+
+        :rtype: ColumnarTimeline
+        """
+        timeline = cls()
+        timeline._times = times
+        timeline._names = names
+        timeline._locations = locations
+        timeline.name_table = list(name_table)
+        timeline.location_table = list(location_table)
+        timeline._name_codes = {name: code for code, name
+                                in enumerate(timeline.name_table)}
+        timeline._location_codes = {location: code for code, location
+                                    in enumerate(timeline.location_table)}
+        return timeline
+
+    @property
+    def columns(self):
+        """The time key, name code and location code columns
+
+        :rtype: tuple
+        """
+        return (self._times, self._names, self._locations)
+
+    def __len__(self):
+        """How many observations are in the timeline
+
+        :rtype: int
+        """
+        return len(self._times)
+
+    def __iter__(self):
+        """Builds each observation in turn, in time order
+
+        :rtype: iterator
+        """
+        return (self._observation(i) for i in range(len(self._times)))
+
+    @property
+    def observations(self):
+        """A list of every observation, in time order
+
+        The Observations are built fresh from the columns each time.
+
+        :rtype: list
+        """
+        return [self._observation(i) for i in range(len(self._times))]
+
+    def add(self, observation):
+        """Adds an Observation to the timeline
+
+        Observations made at the same time stay in the order
+        they were added.
+
+        :param Observation observation: A single observation
+
+        :return: None
+        """
+        self._own_columns()
+        index = bisect_right(self._times, observation.key)
+        self._times.insert(index, observation.key)
+        self._names.insert(index, self._code(
+            observation.name, self.name_table, self._name_codes))
+        self._locations.insert(index, self._code(
+            observation.location, self.location_table,
+            self._location_codes))
+        if self._suspects is not None:
+            times, locations = self._suspects.setdefault(
+                self._names[index], (array('q'), array('i')))
+            at = bisect_right(times, observation.key)
+            times.insert(at, observation.key)
+            locations.insert(at, self._locations[index])
+
+    def add_many(self, observations):
+        """Adds a batch of Observations to the timeline
+
+        Ends up in the same order as calling add() on each
+        observation in turn. Only the columns from the batch's earliest
+        time on are sorted again, with the batch after them, and the
+        sort and shuffle of each column run in C.
+
+        :param iterable observations: Observations in any order
+
+        :return: None
+        """
+        self._own_columns()
+        times = array('q')
+        names = array('i')
+        locations = array('i')
+        for o in observations:
+            times.append(o.key)
+            names.append(self._code(o.name, self.name_table,
+                                    self._name_codes))
+            locations.append(self._code(
+                o.location, self.location_table, self._location_codes))
+        if not times:
+            return
+        if self._suspects is not None:
+            for i in sorted(range(len(times)), key=times.__getitem__):
+                suspect_times, suspect_locations = self._suspects.setdefault(
+                    names[i], (array('q'), array('i')))
+                at = bisect_right(suspect_times, times[i])
+                suspect_times.insert(at, times[i])
+                suspect_locations.insert(at, locations[i])
+
+        # Everything from the first slot the batch can go in, which is
+        # after every observation made at the batch's earliest time
+        first = bisect_right(self._times, min(times))
+        times = self._times[first:] + times
+        names = self._names[first:] + names
+        locations = self._locations[first:] + locations
+        # A stable sort, so the columns already there come before the
+        # batch, and ties in the batch stay in the order given
+        order = sorted(range(len(times)), key=times.__getitem__)
+        self._times[first:] = array('q', map(times.__getitem__, order))
+        self._names[first:] = array('i', map(names.__getitem__, order))
+        self._locations[first:] = array('i', map(locations.__getitem__,
+                                                 order))
+
+    def between(self, start, end):
+        """The observations made from one time up to another
+
+        :param datetime start: The earliest time to include
+
+        :param datetime end: The time to stop at. Observations made at
+            this time are left out.
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return [self._observation(i) for i in range(
+            bisect_left(self._times, time_key(start)),
+            bisect_left(self._times, time_key(end)))]
+
+    def before(self, time):
+        """The observations made before a time
+
+        :param datetime time: The time to stop at, which is left out
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return [self._observation(i) for i in range(
+            bisect_left(self._times, time_key(time)))]
+
+    def after(self, time):
+        """The observations made at or after a time
+
+        Together with before(time), this covers every observation.
+
+        :param datetime time: The earliest time to include
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return [self._observation(i) for i in range(
+            bisect_left(self._times, time_key(time)), len(self._times))]
+
+    def trajectory(self, name, start=None, end=None):
+        """Where a suspect was seen, from one time up to another
+
+        Found by binary search in the suspect's own columns.
+
+        :param str name: The suspect's name
+
+        :param datetime start: The earliest time to include, if given
+
+        :param datetime end: The time to stop at, if given. Observations
+            made at this time are left out.
+
+        :return: The suspect's observations, in time order
+
+        :rtype: list
+        """
+        code = self._name_codes.get(name)
+        if code is None:
+            return []
+        if self._suspects is None:
+            self._suspects = {}
+            for time, name_code, location in zip(*self.columns):
+                times, locations = self._suspects.setdefault(
+                    name_code, (array('q'), array('i')))
+                times.append(time)
+                locations.append(location)
+        times, locations = self._suspects.get(code, ((), ()))
+        first = 0 if start is None else bisect_left(times, time_key(start))
+        last = (len(times) if end is None else
+                bisect_left(times, time_key(end)))
+        return [Observation.from_epoch(name,
+                                       self.location_table[locations[i]],
+                                       times[i])
+                for i in range(first, last)]
+
+    def window_ranges(self, window_size=timedelta(0, 3600),
+                      skip_singletons=False):
+        """Yields the index range of every window in the timeline
+
+        :param timedelta window_size: timeframe
+
+        :param bool skip_singletons: Skip windows with only one observation
+
+        :yield: A (start, end) tuple of indices into the timeline
+
+        :rtype: tuple
+        """
+        times = self._times
+        seconds = window_size.total_seconds()
+        end = 0
+        for start in range(len(times)):
+            # Binary search for the end, from where the last window ended
+            end = max(bisect_left(times, times[start] + seconds, end),
+                      start + 1)
+            if skip_singletons and end - start == 1:
+                continue
+            yield start, end
+
+    def windows(self, window_size=timedelta(0, 3600), skip_singletons=False):
+        """Yields all observations that happen within
+        a specified timeframe from the first observation
+
+        :param timedelta window_size: timeframe
+
+        :param bool skip_singletons: Skip windows with only one observation
+
+        :yield: A tuple of the observations in timeframe
+        from first observation
+
+        :rtype: tuple
+        """
+        for start, end in self.window_ranges(window_size, skip_singletons):
+            yield tuple(self._observation(i) for i in range(start, end))
+
+    def rendezvous(self, window_size=timedelta(0, 3600), start=None,
+                   end=None, counts=None):
+        """Sees if two agents rendeviwed or not
+
+        Sorts the range by location, then compares each observation
+        with the next one at its location a whole column at a time,
+        using map() and compress() so that the loop runs in C. Only
+        the windows where someone met are looked at one by one.
+
+        :param timedelta window_size: timeframe of observations
+
+        :param datetime start: Only look at windows starting at or
+            after this time, if given
+
+        :param datetime end: Only look at windows starting before this
+            time, if given
+
+        :param dict counts: Where to count the windows looked at, if
+            desired. See count_windows().
+
+        :returns: A tuple with the following items:
+
+                - First observation
+
+                - Second observation
+
+        :rtype: tuple
+
+        :raises DataError: If too many observations happen in timeframe
+
+        """
+        seconds = window_size.total_seconds()
+        keys = self._times
+        # Binary search for the windows in the range, and for the last
+        # observation those windows can reach
+        first = 0 if start is None else bisect_left(keys, time_key(start))
+        last = len(keys)
+        reach = len(keys)
+        if end is not None:
+            last = bisect_left(keys, time_key(end))
+            reach = bisect_left(keys, time_key(end) + seconds)
+        # Positions in the range, grouped by location and in time order
+        # at each one, from a stable sort of the location column
+        codes = self._locations[first:reach]
+        order = sorted(range(len(codes)), key=codes.__getitem__)
+        codes = list(map(codes.__getitem__, order))
+        times = list(map(keys[first:reach].__getitem__, order))
+        # Only the observations followed by another at the same location
+        # less than window_size later can meet, and they are picked out
+        # a column at a time in C
+        met = compress(range(len(times) - 1), map(
+            and_, map(eq, codes, islice(codes, 1, None)),
+            map(seconds.__gt__, map(sub, islice(times, 1, None), times))))
+
+        # (position of first observation, position of second or None)
+        found = []
+        comparisons = 0
+        for k in met:
+            if first + order[k] >= last:
+                continue
+            # Two is already too many, so don't look any further
+            if (k + 2 < len(times) and codes[k + 2] == codes[k] and
+                    times[k + 2] - times[k] < seconds):
+                comparisons += 2
+                found.append((first + order[k], None))
+            else:
+                comparisons += 1
+                found.append((first + order[k], first + order[k + 1]))
+        found.sort()
+        count_windows(counts, last - first, comparisons)
+
+        for first, second in found:
+            # If 3 agents are at the same place at the same time, raise Error
+            if second is None:
+                raise DataError("Can only have one rendezvous in a window")
+            yield (self._observation(first), self._observation(second))
+
+    def _own_columns(self):
+        """Copies the columns into arrays, if they aren't already
+
+        :return: None
+        """
+        if not isinstance(self._times, array):
+            self._times = array('q', self._times)
+            self._names = array('i', self._names)
+            self._locations = array('i', self._locations)
+
+    def _observation(self, index):
+        """Builds the Observation at a position in the timeline
+
+        :param int index: Position in the timeline
+
+        :rtype: Observation
+        """
+        return Observation.from_epoch(
+            self.name_table[self._names[index]],
+            self.location_table[self._locations[index]],
+            self._times[index])
+
+    @staticmethod
+    def _code(value, table, codes):
+        """Looks up the code for a string, giving it one if it's new
+
+        :param str value: The string to look up
+
+        :param list table: The strings that already have codes
+
+        :param dict codes: Maps each string in the table to its code
+
+        :return: The string's code
+
+        :rtype: int
+        """
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
@@ -1,23 +1,63 @@
 import argparse
-import csv
-import pprint
+import cProfile
+import glob
+import os
+import sys
+from datetime import datetime, timedelta
+from heapq import merge
+from operator import attrgetter
+from columnar_timeline import ColumnarTimeline
 from observation_timeline import ObservationTimeline
-from observation import Observation
-
-
-def load_timeline(filename):
+from observation import EPOCH, TIME_FORMAT, Observation, time_key
+from observation_follow import follow_rendezvous, tail_lines
+from observation_reader import map_rows
+from observation_stream import (DuplicateFilter, external_sort,
+                                stream_rendezvous)
+from output_writer import FORMATS, open_writer
+from ownership import Ownership
+from parallel import find_rendezvous, load_observations
+from profiling import Profile
+from sqlite_timeline import SqliteTimeline
+from timeline_cache import fingerprint, read_cache, write_cache
+from tracker_state import TrackerState
+
+
+BACKENDS = {
+    'list': ObservationTimeline,
+    'columnar': ColumnarTimeline,
+    'sqlite': SqliteTimeline,
+}
+"""The timeline classes that load_timeline can load into, by name"""
+
+
+def load_timeline(filename, timeline=None, jobs=1, profile=None,
+                  duplicates=None):
     """Loads an observations CSV file.
 
     :param str filename: The name of the observations CSV file to read
 
+    :param timeline: An empty timeline to load the observations into,
+        such as a ColumnarTimeline. Defaults to a new
+        ObservationTimeline.
+
+    :param int jobs: How many processes to parse the file with
+
+    :param Profile profile: Where to measure the read, parse and
+        timeline build stages, if desired. Each is timed bit by bit as
+        the rows go through it.
+
+    :param DuplicateFilter duplicates: What to drop repeats of the same
+        observation in the file with, if desired. This happens in the
+        same pass as parsing.
+
     :returns: A tuple with the following items:
 
                 - A dictionary that maps a suspect's name to the
                   item they are currently carrying (based on data in
                   the CSV file).
 
-                - An ObservationTimeline that contains the observation
-                  data loaded from the CSV file.
+                - The timeline, containing the observation data
+                  loaded from the CSV file.
 
     :rtype: tuple
 
@@ -34,44 +74,382 @@ def load_timeline(filename):
 
     """
     try:
-        # Create an empty timeline
-        timeline = ObservationTimeline()
+        if timeline is None:
+            timeline = ObservationTimeline()
+        if profile is None:
+            profile = Profile(enabled=False)
+        # Split the parsing up between processes, if desired
+        if jobs > 1:
+            with profile.stage('read'):
+                carrying, observations = load_observations(filename, jobs)
+            # The chunks are merged as the timeline takes them
+            observations = profile.iterate('read', observations,
+                                           'rows parsed')
+            if duplicates is not None:
+                observations = profile.iterate(
+                    'dedup', duplicates.filter(observations))
+            with profile.stage('timeline build'):
+                timeline.add_many(observations)
+            return (carrying, timeline)
         # Dictionary mapping agent's name to held item
         carrying = {}
-        # Read data from input file
-        with open(filename, newline='') as csvfile:
-            obs = csv.reader(csvfile, delimiter='\n')
-            for row in obs:
-                # Unpack each row
-                col = tuple(row[0].split(','))
-                # If too many or too few arguments, Error
-                if not len(col) == 4:
-                    raise ValueError("Unpacking row error")
-                # Adds observation to timeline
-                timeline.add(Observation(col[0], col[1], col[2]))
+        # Each stage is timed as the rows pass through it, so nothing
+        # is held in memory that wouldn't be without profiling
+        rows = profile.iterate('read', map_rows(filename))
+
+        def observations():
+            # Read data from input file
+            for name, location, key, item in rows:
                 # If agent is carrying item, add to timeline
-                if not col[3] == '':
-                    carrying.update({col[0]: col[3]})
+                if not item == '':
+                    carrying.update({name: item})
+                yield Observation.from_epoch(name, location, key)
+
+        batch = profile.iterate('parse', observations(), 'rows parsed')
+        # Drop repeated observations on the way through
+        if duplicates is not None:
+            batch = profile.iterate('dedup', duplicates.filter(batch))
+        # Sort the observations once instead of on every add
+        with profile.stage('timeline build'):
+            timeline.add_many(batch)
         # Return Tuple of carried item dict and ObsTimeline
         return (carrying, timeline)
     except OSError:
         raise OSError("Cannot open file")
 
 
+def load_cached_timeline(filename, timeline=None, jobs=1, profile=None,
+                         duplicates=None):
+    """Loads an observations CSV file, using its cache file if possible.
+
+    If the cache file was written for the CSV file's current contents,
+    the timeline is mapped in from it. Otherwise the CSV file is
+    loaded by load_timeline, and the cache file is (re)written.
+
+    :param str filename: The name of the observations CSV file to read
+
+    :param timeline: An empty timeline to load the observations into.
+        Defaults to a new ObservationTimeline. A ColumnarTimeline is
+        replaced by one backed by the cache file.
+
+    :param int jobs: How many processes to parse the file with
+
+    :param Profile profile: Where to measure each stage, if desired
+
+    :param DuplicateFilter duplicates: What to drop repeats of the same
+        observation in the file with, if desired. The cache file only
+        holds the observations that are left, so repeats are only
+        counted when it is written.
+
+    :returns: The same tuple as load_timeline
+
+    :rtype: tuple
+
+    :raises ValueError: If there is an issue loading a row.
+
+    :raises OSError: If there is an issue finding or opening the file.
+
+    """
+    if profile is None:
+        profile = Profile(enabled=False)
+    try:
+        with profile.stage('read'):
+            key = fingerprint(filename)
+    except OSError:
+        raise OSError("Cannot open file")
+    if timeline is None:
+        timeline = ObservationTimeline()
+
+    with profile.stage('read'):
+        cached = read_cache(filename, key)
+    if cached is None:
+        carrying, timeline = load_timeline(filename, timeline, jobs, profile,
+                                           duplicates)
+        try:
+            write_cache(filename, key, carrying, timeline)
+        except OSError:
+            # Not being able to cache shouldn't stop us
+            pass
+        return (carrying, timeline)
+
+    carrying, columns = cached
+    if isinstance(timeline, ColumnarTimeline):
+        return (carrying, columns)
+    with profile.stage('timeline build'):
+        timeline.add_many(columns.observations)
+    return (carrying, timeline)
+
+
+def stream_timeline(filename, run_size=100000, profile=None,
+                    duplicates=None):
+    """Loads an observations CSV file without holding it in memory.
+
+    The file is read once up front to check every row and collect the
+    items being carried. The observations are then read again as they
+    are needed. If the file isn't already in time order, it is sorted
+    through temporary files instead of in memory.
+
+    :param str filename: The name of the observations CSV file to read
+
+    :param int run_size: Most observations to sort in memory at once
+
+    :param Profile profile: Where to measure the first read through,
+        and the parsing (and any sorting) as the observations are
+        needed, if desired
+
+    :param DuplicateFilter duplicates: What to drop repeats of the same
+        observation in the file with, if desired. Since they come in
+        time order, only the observations made at one time are held
+        at once.
+
+    :returns: A tuple with the following items:
+
+                - A dictionary that maps a suspect's name to the
+                  item they are currently carrying (based on data in
+                  the CSV file).
+
+                - An iterator over the observations in the CSV file,
+                  in time order.
+
+    :rtype: tuple
+
+    :raises ValueError: If there is an issue unpacking the values of a
+        row into name, location, time, and item, or loading the time.
+
+    :raises OSError: If there is an issue finding or opening the file.
+
+    """
+    if profile is None:
+        profile = Profile(enabled=False)
+    try:
+        carrying = {}
+        in_order = True
+        latest = None
+        rows = 0
+        with profile.stage('read'):
+            for rows, (name, location, key, item) in enumerate(
+                    map_rows(filename), 1):
+                # Check whether the file is still in order
+                if latest is not None and key < latest:
+                    in_order = False
+                latest = key
+                # If agent is carrying item, keep track of it
+                if not item == '':
+                    carrying.update({name: item})
+        profile.count('rows parsed', rows)
+    except OSError:
+        raise OSError("Cannot open file")
+
+    observations = (Observation.from_epoch(name, location, key)
+                    for name, location, key, _ in map_rows(filename))
+    if not in_order:
+        observations = external_sort(observations, run_size)
+    if duplicates is not None:
+        observations = duplicates.filter(observations, in_order=True)
+    return (carrying, profile.iterate('parse', observations))
+
+
+def merge_timelines(filenames, timeline=None, jobs=1, profile=None,
+                    cache=True, duplicates=None):
+    """Loads several observations CSV files into one timeline.
+
+    Each file is loaded (and so sorted) on its own, from its cache file
+    if possible. Their observations are then merged with a heap, which
+    the timeline can take in without sorting them again. Observations
+    made at the same time stay in file order, then row order, as if
+    the files had been joined end to end.
+
+    :param list filenames: The names of the observations CSV files
+
+    :param timeline: An empty timeline to load the observations into.
+        Defaults to a new ObservationTimeline.
+
+    :param int jobs: How many processes to parse each file with
+
+    :param Profile profile: Where to measure each stage, if desired
+
+    :param bool cache: Whether to use the files' cache files
+
+    :param DuplicateFilter duplicates: What to drop repeats of the same
+        observation with, if desired. Each file's own repeats are
+        dropped as it is loaded, and repeats across files as they are
+        merged, which only holds the observations made at one time.
+
+    :returns: The same tuple as load_timeline, with the items carried
+        taken from the files in order
+
+    :rtype: tuple
+
+    :raises ValueError: If there is an issue loading a row.
+
+    :raises OSError: If there is an issue finding or opening a file.
+
+    """
+    load = load_cached_timeline if cache else load_timeline
+    if timeline is None:
+        timeline = ObservationTimeline()
+    if profile is None:
+        profile = Profile(enabled=False)
+    if len(filenames) == 1:
+        return load(filenames[0], timeline, jobs, profile, duplicates)
+    if isinstance(timeline, SqliteTimeline):
+        # The database keeps everything in order as each file is added,
+        # so there's no need to hold the files in memory to merge them
+        carrying = {}
+        for filename in filenames:
+            file_carrying, _ = load(filename, timeline, jobs, profile,
+                                    duplicates)
+            carrying.update(file_carrying)
+        return (carrying, timeline)
+
+    carrying = {}
+    parts = []
+    for filename in filenames:
+        file_carrying, part = load(filename, type(timeline)(), jobs, profile,
+                                   duplicates)
+        carrying.update(file_carrying)
+        parts.append(iter(part))
+    with profile.stage('merge'):
+        merged = merge(*parts, key=attrgetter('key'))
+        if duplicates is not None:
+            merged = duplicates.filter(merged, in_order=True)
+        timeline.add_many(merged)
+    return (carrying, timeline)
+
+
+def stream_timelines(filenames, run_size=100000, profile=None,
+                     duplicates=None):
+    """Streams several observations CSV files through in time order.
+
+    Each file is checked and, if it isn't in time order, sorted on its
+    own like stream_timeline does. The files are then merged with a
+    heap, which only ever holds one observation from each file.
+
+    :param list filenames: The names of the observations CSV files
+
+    :param int run_size: Most observations to sort in memory at once
+
+    :param Profile profile: Where to measure each stage, if desired
+
+    :param DuplicateFilter duplicates: What to drop repeats of the same
+        observation with, if desired. They are dropped from each file,
+        then from the merged files.
+
+    :returns: The same tuple as stream_timeline, with the items carried
+        taken from the files in order
+
+    :rtype: tuple
+
+    :raises ValueError: If there is an issue loading a row.
+
+    :raises OSError: If there is an issue finding or opening a file.
+
+    """
+    carrying = {}
+    streams = []
+    for filename in filenames:
+        file_carrying, observations = stream_timeline(filename, run_size,
+                                                      profile, duplicates)
+        carrying.update(file_carrying)
+        streams.append(observations)
+    if len(streams) == 1:
+        return (carrying, streams[0])
+    merged = merge(*streams, key=attrgetter('key'))
+    if duplicates is not None:
+        merged = duplicates.filter(merged, in_order=True)
+    return (carrying, merged)
+
+
+def expand_globs(patterns):
+    """Expands wildcards in file names given on the command line.
+
+    :param list patterns: File names, which may hold glob wildcards
+
+    :returns: The matching file names, in sorted order for each
+        pattern. A name that matches nothing is kept as it is, so that
+        opening it reports the problem.
+
+    :rtype: list
+
+    """
+    filenames = []
+    for pattern in patterns:
+        filenames += sorted(glob.glob(pattern)) or [pattern]
+    return filenames
+
+
+def load_items(filename):
+    """Loads a file of items to look up, one item per line.
+
+    :param str filename: The name of the file to read
+
+    :returns: The items, in file order. Blank lines are skipped.
+
+    :rtype: list
+
+    :raises OSError: If there is an issue finding or opening the file.
+
+    """
+    with open(filename) as f:
+        return [line.rstrip('\r\n') for line in f if line.strip('\r\n')]
+
+
+def observation_time(text):
+    """Reads a time given on the command line.
+
+    :param str text: A time in TIME_FORMAT
+
+    :rtype: datetime
+
+    :raises ValueError: If the time is not in TIME_FORMAT
+
+    """
+    return datetime.strptime(text, TIME_FORMAT)
+
+
+def close_timeline(timeline):
+    """Closes a timeline that keeps a database open, once done with it
+
+    :param timeline: Any timeline, or None
+
+    :return: None
+    """
+    if isinstance(timeline, SqliteTimeline):
+        timeline.close()
+
+
 def main(args):
     """Program entry point.
 
-    - Loads a CSV file of observations
+    - Loads CSV files of observations, merging them in time order, or
+      streams them through in time order if desired
+
+      - Or adds them to a saved state file, if desired
+
+      - Or adds them to a SQLite database kept between runs, if desired
+
+      - Drops repeats of the same observation, and reports how many
 
     - Determines how items were exchanged during various rendezvous
 
       - Prints the exchanges as they happen, if desired
 
-    - Prints the latest owner of a specific item, if desired.
+      - Only up to a given time, and only printing the exchanges after
+        another given time, if desired
+
+    - Or follows a CSV file as rows are written to it, printing each
+      exchange once no later row can change it, until Ctrl-C
+
+    - Prints the latest owner of specific items, if desired.
 
       - Otherwise neatly prints a dictionary mapping suspects to
         the item they currently own.
 
+      - Or, if desired, does the same for earlier points in time.
+
+    - Or prints where specific suspects were seen, or every time
+      specific items changed hands, if desired.
+
     This program will return an exit code of `1` in one of two
     situations:
 
@@ -88,32 +466,178 @@ def main(args):
     :returns: Nothing
 
     """
-    # Tuple of carried items and timeline
-    time_tuple = load_timeline(args.observations)
-
-    # For each Observation in list, calculated final held item
-    for suspectPair in time_tuple[1].rendezvous():
-        # If user wanted exchanges, print each exchange
-        if args.exchanges:
-            print(suspectPair[0].name + " meets with " +
-                  suspectPair[1].name +
-                  " to exchange " + time_tuple[0][suspectPair[0].name] +
-                  " for " + time_tuple[0][suspectPair[1].name] + ".")
-        # Trades items
-        temp_item = time_tuple[0][suspectPair[0].name]
-        time_tuple[0][suspectPair[0].name] = time_tuple[0][suspectPair[1].name]
-        time_tuple[0][suspectPair[1].name] = temp_item
-
-    # If no items specified or exchanges is true,
-    # print list of final help items
-    if (args.item == '') or (args.exchanges):
-        pprint.pprint(time_tuple[0], indent=4)
-
-    # If user specified an item, print who has said item
-    if not args.item == '':
-        for name, i in time_tuple[0].items():
-            if i == args.item:
-                print(name + " had the " + i)
+    # Measures each stage of the run, if desired
+    profile = Profile(enabled=args.profile is not None)
+    # The observations files, with any wildcards filled in
+    filenames = expand_globs(args.observations)
+
+    # Where the results go, in the format the user wants
+    output = open_writer(args.format)
+
+    # Drops repeats of the same observation, and counts them
+    duplicates = DuplicateFilter()
+    # Where the rendezvous search counts the windows it looks at
+    counts = profile.counters if profile.enabled else None
+
+    state = None
+    timeline = None
+    ownership = None
+    if args.follow:
+        # Suspects are added as they turn up, and nothing is kept for
+        # looking back, so memory doesn't grow as time goes on
+        ownership = Ownership({}, history=False)
+        carrying = ownership.carrying
+        # Get exchanges out as soon as the file has nothing new
+        lines = tail_lines(filenames[0], idle=output.flush)
+        rendezvous = profile.iterate(
+            'rendezvous', follow_rendezvous(lines, ownership))
+    elif args.state:
+        # Add the new observations to everything seen before
+        with profile.stage('load state'):
+            state = (TrackerState.load(args.state)
+                     if os.path.exists(args.state) else TrackerState())
+        carrying, timeline = merge_timelines(filenames, profile=profile,
+                                             cache=False,
+                                             duplicates=duplicates)
+        with profile.stage('update state'):
+            rendezvous = state.update(carrying, timeline.observations,
+                                      counts, duplicates)
+        rendezvous = profile.iterate('rendezvous', rendezvous)
+        ownership = state.ownership
+        carrying = ownership.carrying
+    elif args.stream:
+        # Carried items, and observations streamed in time order
+        carrying, observations = stream_timelines(filenames,
+                                                  profile=profile,
+                                                  duplicates=duplicates)
+        rendezvous = profile.iterate(
+            'rendezvous', stream_rendezvous(observations, end=args.end,
+                                            counts=counts))
+    else:
+        # A cache or a hash set of every observation would be held in
+        # memory, which is what the SQLite backend is there to avoid. It
+        # drops repeats itself instead.
+        on_disk = args.backend == 'sqlite' or args.db is not None
+        if args.db is not None:
+            timeline = SqliteTimeline(args.db)
+        else:
+            timeline = BACKENDS[args.backend]()
+        # Carried items and timeline
+        try:
+            carrying, timeline = merge_timelines(
+                filenames, timeline, args.jobs, profile,
+                not (args.no_cache or on_disk),
+                None if on_disk else duplicates)
+        except BaseException:
+            close_timeline(timeline)
+            raise
+        if on_disk:
+            duplicates.dropped += timeline.dropped
+        if args.db is not None:
+            # Everyone the database has seen, not just in these files
+            timeline.add_carrying(carrying)
+            carrying = timeline.carrying
+        # Look for rendezvous at different locations in parallel too
+        if args.jobs > 1 and isinstance(timeline, ObservationTimeline):
+            rendezvous = find_rendezvous(timeline, args.jobs, end=args.end,
+                                         counts=counts)
+        else:
+            rendezvous = timeline.rendezvous(end=args.end, counts=counts)
+        rendezvous = profile.iterate('rendezvous', rendezvous)
+
+    # Items the user wants to know the owners of
+    items = [item for item in args.item if not item == '']
+    if args.item_file:
+        items += load_items(args.item_file)
+
+    # Tracks who owns what, both ways round. Exchanges are only logged
+    # when something looks back at them.
+    if ownership is None:
+        ownership = Ownership(carrying,
+                              history=bool(args.at or args.provenance))
+
+    # Where suspects were doesn't depend on any exchanges, so don't
+    # look for them unless they're wanted or the state needs them
+    if (args.suspect and state is None and not args.exchanges and
+            not args.provenance):
+        rendezvous = ()
+
+    # Exchanges before --from still happen, they just aren't printed
+    start = None if args.start is None else time_key(args.start)
+
+    try:
+        # For each Observation in list, calculated final held item
+        found = 0
+        # Following always prints exchanges, since it never gets to the end
+        printing = args.exchanges or args.follow
+        with profile.stage('exchange replay'):
+            for suspectPair in rendezvous:
+                found += 1
+                # If user wanted exchanges, print each exchange
+                if printing and (start is None or
+                                 suspectPair[0].key >= start):
+                    output.exchange(suspectPair[0], suspectPair[1],
+                                    carrying[suspectPair[0].name],
+                                    carrying[suspectPair[1].name])
+                # Trades items
+                ownership.exchange(suspectPair[0], suspectPair[1])
+        profile.count('rendezvous found', found)
+
+        # Keep everything for the next batch of observations
+        if state is not None:
+            with profile.stage('save state'):
+                state.save(args.state)
+
+        with profile.stage('output'):
+            # If user asked where suspects or items have been, answer
+            # that instead
+            if args.suspect or args.provenance:
+                if state is not None:
+                    timeline = state.timeline
+                for name in args.suspect:
+                    for observation in timeline.trajectory(name, args.start,
+                                                           args.end):
+                        output.observation(observation)
+                # The replay logged every transfer, so this is a lookup
+                for item in args.provenance:
+                    for key, old, new, location in ownership.provenance(
+                            item):
+                        if start is None or key >= start:
+                            at = EPOCH + timedelta(seconds=key)
+                            output.transfer(item, at.strftime(TIME_FORMAT),
+                                            old, new, location)
+            # If user asked about earlier times, answer those instead
+            elif args.at:
+                for time in args.at:
+                    key = time_key(time)
+                    at = time.strftime(TIME_FORMAT)
+                    if not items:
+                        output.carrying(ownership.carrying_at(key), at)
+                    for item in items:
+                        for name in ownership.owners_at(item, key):
+                            output.owner(name, item, at)
+            else:
+                # If no items specified or exchanges is true,
+                # print list of final help items
+                if not items or args.exchanges:
+                    output.carrying(carrying)
+
+                # If user specified items, print who has each of them
+                for item in items:
+                    for name in ownership.owners(item):
+                        output.owner(name, item)
+    finally:
+        output.close()
+        close_timeline(timeline)
+
+    # Let the user know their files repeat themselves
+    profile.count('duplicates dropped', duplicates.dropped)
+    if duplicates.dropped:
+        sys.stderr.write("Dropped " + str(duplicates.dropped) +
+                         " duplicate observations\n")
+
+    if profile.enabled:
+        profile.write(args.profile)
 
 
 if __name__ == '__main__':
@@ -123,22 +647,156 @@ if __name__ == '__main__':
         'spreadsheet of suspect observations.'
     )
 
-    # Add a positional argument for the observations file.
-    parser.add_argument('observations',
-                        help='A CSV file to read observations from.')
-
-    # Add an optional flag, so that the user can tell us which item
-    # they want to see the owner of
-    parser.add_argument('--item', type=str, default='',
-                        help='An optional item to print the owner of.')
+    # Add a positional argument for the observations files.
+    parser.add_argument('observations', nargs='+',
+                        help='CSV files to read observations from. '
+                        'Wildcards like "offices/*.csv" are expanded. '
+                        'Files compressed with gzip, bzip2 or xz are '
+                        'decompressed as they are read.')
+
+    # Add an optional flag, so that the user can tell us which items
+    # they want to see the owners of
+    parser.add_argument('--item', type=str, action='append', default=[],
+                        help='An optional item to print the owner of. '
+                        'Can be given more than once.')
+
+    # Add an optional flag, so that the user can give us a whole file
+    # of items to see the owners of
+    parser.add_argument('--item-file', type=str,
+                        help='An optional file of items to print the '
+                        'owners of, one per line.')
+
+    # Add an optional flag, so that the user can ask who had what at
+    # earlier points in time
+    parser.add_argument('--at', type=observation_time, action='append',
+                        default=[],
+                        help='An optional time ("YYYY-MM-DD HH:MM:SS") to '
+                        'report owners at instead of the end. Can be '
+                        'given more than once.')
+
+    # Add an optional flag, so that the user can ask where suspects
+    # were seen
+    parser.add_argument('--suspect', type=str, action='append', default=[],
+                        help='An optional suspect to print the '
+                        'observations of, in time order, instead of '
+                        'owners. Limited by --from and --to. Can be given '
+                        'more than once.')
+
+    # Add an optional flag, so that the user can ask how items changed
+    # hands
+    parser.add_argument('--provenance', type=str, action='append',
+                        default=[], metavar='ITEM',
+                        help='An optional item to print every change of '
+                        'hands of, in order, instead of owners. Can be '
+                        'given more than once.')
 
     # Add an optional flag, that will tell us to print exchanges as
     # they occur instead of printing the whole mapping at the end.
     parser.add_argument('--exchanges', action='store_true',
                         help='Print all exchanges')
 
+    # Add an optional flag, that will tell us to stream the observations
+    # instead of loading them all into memory at once.
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream observations instead of loading '
+                        'them all into memory')
+
+    # Add an optional flag, that will tell us to keep reading the
+    # observations file as rows are added to it
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep reading the observations file as rows '
+                        'are added to it, printing each exchange once '
+                        'rows an hour later have arrived. Rows more than '
+                        'an hour behind the latest one are skipped. '
+                        'Stop with Ctrl-C.')
+
+    # Add an optional flag, so that the user can pick how the timeline
+    # is stored in memory
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        default='list',
+                        help='How to store the timeline: in memory as '
+                        'lists or columns, or on disk in a temporary '
+                        'SQLite file (default: list)')
+
+    # Add an optional flag, so that the observations can be kept on
+    # disk between runs
+    parser.add_argument('--db', type=str, metavar='FILE',
+                        help='An optional SQLite database to keep the '
+                        'timeline and carried items in, instead of a '
+                        'temporary one. Observations already in it are '
+                        'included, and only new rows are added.')
+
+    # Add an optional flag, so that the user can spread loading the
+    # file over several processes
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='How many processes to load the file and '
+                        'find rendezvous with')
+
+    # Add an optional flag, that will tell us not to use or write the
+    # cache file that sits next to the observations file.
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always load the observations file itself')
+
+    # Add an optional flag, so that new observations can be added to
+    # the ones seen before instead of starting over each time
+    parser.add_argument('--state', type=str,
+                        help='An optional file to keep the tracker state '
+                        'in. The observations file is added to it, and '
+                        'only rendezvous it could change are replayed.')
+
+    # Add optional flags, so that the user can look at just part of the
+    # time covered by the observations
+    parser.add_argument('--from', type=observation_time, dest='start',
+                        help='An optional time ("YYYY-MM-DD HH:MM:SS") '
+                        'to print exchanges from. Earlier exchanges still '
+                        'count towards who has what.')
+    parser.add_argument('--to', type=observation_time, dest='end',
+                        help='An optional time ("YYYY-MM-DD HH:MM:SS") '
+                        'to stop at. Rendezvous starting then or later '
+                        'are left out.')
+
+    # Add an optional flag, so that other programs can read the output
+    parser.add_argument('--format', choices=sorted(FORMATS), default='text',
+                        help='How to write exchanges and owners: text '
+                        '(default), or one JSON object or CSV row per '
+                        'record')
+
+    # Add an optional flag, so that the user can see which stages of
+    # the run take the time and memory
+    parser.add_argument('--profile', type=str, metavar='FILE',
+                        help='Write the time and peak memory of each '
+                        'stage, and counts of the work done, to FILE as '
+                        'JSON ("-" for stderr)')
+
+    # Add an optional flag, so that the user can profile every function
+    parser.add_argument('--cprofile', type=str, metavar='FILE',
+                        help='Write cProfile statistics for the whole run '
+                        'to FILE, for pstats or snakeviz')
+
     # Parse the arguments
     args = parser.parse_args()
+    if args.suspect and (args.stream or args.follow):
+        parser.error('--suspect needs the whole timeline, so cannot be '
+                     'used with --stream or --follow')
+    if args.follow and (len(args.observations) > 1 or args.state or
+                        args.stream or args.at or args.end is not None or
+                        args.provenance):
+        parser.error('--follow takes one observations file, and cannot be '
+                     'used with --state, --stream, --at, --to or '
+                     '--provenance')
+    if args.db and (args.state or args.stream or args.follow):
+        parser.error('--db cannot be used with --state, --stream or '
+                     '--follow')
+    if args.state and args.end is not None:
+        parser.error('--to cannot be used with --state, since the state '
+                     'has to include every rendezvous')
 
     # GO!
-    main(args)
+    if args.cprofile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(main, args)
+        finally:
+            profiler.dump_stats(args.cprofile)
+    else:
+        main(args)
@@ -1,7 +1,70 @@
-from datetime import datetime
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from sys import intern
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+"""The format of observation times"""
+
+EPOCH = datetime(1970, 1, 1)
+"""The time that observation keys count seconds from"""
+
+_EPOCH_DAY = EPOCH.toordinal()
+
+# The zero-padded layout that almost every TIME_FORMAT time has
+_FIXED_TIME = re.compile(r'(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d)\Z',
+                         re.ASCII)
+
+
+def time_key(time):
+    """Converts a datetime into seconds since the epoch
+
+    Unlike a time key from parse_time, the result can have a
+    fractional part, but it compares with time keys just the same.
+
+    :param datetime time: A point in time
+
+    :rtype: float
+    """
+    return (time - EPOCH).total_seconds()
+
+
+@lru_cache(maxsize=65536)
+def parse_time(time):
+    """Converts an observation time into seconds since the epoch
+
+    Times in the usual zero-padded TIME_FORMAT layout are split up
+    and converted directly. Anything else is left to datetime.strptime, so
+    the same strings are accepted and rejected as before. Recent
+    results are cached, since the same time often shows up in many
+    rows.
+
+    :param str time: arival time, in TIME_FORMAT
+
+    :return: seconds since the epoch
+
+    :rtype: int
+
+    :raises ValueError: If the time is not in TIME_FORMAT
+    """
+    match = _FIXED_TIME.match(time)
+    if match:
+        year, month, day, hour, minute, second = map(int, match.groups())
+        try:
+            if hour < 24 and minute < 60 and second < 60:
+                days = date(year, month, day).toordinal() - _EPOCH_DAY
+                return days * 86400 + hour * 3600 + minute * 60 + second
+        except ValueError:
+            # Let strptime decide what the problem is
+            pass
+    delta = datetime.strptime(time, TIME_FORMAT) - EPOCH
+    return delta.days * 86400 + delta.seconds
 
 
 class Observation:
+    # No per-instance __dict__, since there can be millions of these
+    __slots__ = ('name', 'location', 'key')
+
     def __init__(self, name, location, time):
         """Constructor for an observation
 
@@ -16,11 +79,74 @@ class Observation:
 
         :return: None
         """
-        self.name = name
-        self.location = location
-        self.timeString = time
-        # Change inputed time to timedate format
-        self.time = datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+        # Share one copy of each name and location between observations
+        self.name = intern(name)
+        self.location = intern(location)
+        # Store the time as whole seconds since the epoch
+        self.key = parse_time(time)
+
+    @classmethod
+    def from_epoch(cls, name, location, key):
+        """Builds an observation from an already parsed time
+
+        :param str name: name of the agent
+
+        :param str location: location of target
+
+        :param int key: arival time, in seconds since the epoch
+
+        :return: A new observation
+
+        :rtype: Observation
+        """
+        observation = cls.__new__(cls)
+        observation.name = intern(name)
+        observation.location = intern(location)
+        observation.key = key
+        return observation
+
+    @property
+    def time(self):
+        """Arival time at location
+
+        :rtype: datetime
+        """
+        return EPOCH + timedelta(seconds=self.key)
+
+    @property
+    def timeString(self):
+        """Arival time at location, as text
+
+        :rtype: str
+        """
+        return self.time.strftime(TIME_FORMAT)
+
+    def __eq__(self, other):
+        """Equal to. Determines if self is the same observation as
+        other: the same agent, at the same location, at the same time
+
+        Unlike the other comparisons, this looks at more than the
+        arrival time, so two observations made at the same time are
+        neither equal nor less than each other.
+
+        :param Observation other: Who we are comparing this to
+
+        :return: Bool, True if every value matches, False otherwise
+
+        :rtype: Bool
+        """
+        if not isinstance(other, Observation):
+            return NotImplemented
+        return (self.key == other.key and self.name == other.name and
+                self.location == other.location)
+
+    def __hash__(self):
+        """Hash of the values that __eq__ compares, so that equal
+        observations can be found in sets and dictionaries
+
+        :rtype: int
+        """
+        return hash((self.name, self.location, self.key))
 
     def __lt__(self, other):
         """Less than. Determins if self arrival time was sooner
@@ -32,10 +158,7 @@ class Observation:
 
         :rtype: Bool
         """
-        if self.time < other.time:
-            return True
-        else:
-            return False
+        return self.key < other.key
 
     def __gt__(self, other):
         """Greater than. Determins if self arrival time was
@@ -47,10 +170,7 @@ class Observation:
 
         :rtype: Bool
         """
-        if self.time > other.time:
-            return True
-        else:
-            return False
+        return self.key > other.key
 
     def __le__(self, other):
         """Less than or equal to. Determins if self arrival
@@ -63,10 +183,7 @@ class Observation:
 
         :rtype: Bool
         """
-        if self.time <= other.time:
-            return True
-        else:
-            return False
+        return self.key <= other.key
 
     def __ge__(self, other):
         """Greater than or equal to. Determins if self arrival
@@ -79,10 +196,7 @@ class Observation:
 
         :rtype: Bool
         """
-        if self.time >= other.time:
-            return True
-        else:
-            return False
+        return self.key >= other.key
 
     def __str__(self):
         """How to output and Observation object
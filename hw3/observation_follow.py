@@ -0,0 +1,186 @@
+import csv
+import locale
+import sys
+import time
+from datetime import timedelta
+from heapq import heappop, heappush
+
+from observation import Observation
+from observation_reader import compression, split_row
+from observation_stream import RendezvousStream
+
+
+class FollowStream:
+    def __init__(self, window_size=timedelta(0, 3600)):
+        """Constructor for a FollowStream
+
+        Finds rendezvous in observations that arrive as they are made,
+        which can be a little out of order. The watermark is the latest
+        time seen minus window_size. Rows older than the watermark are
+        too late to be counted, so a window is final once it ends at or
+        before the watermark, and its observations can be let go.
+
+        :param timedelta window_size: timeframe of observations, and
+            how late an observation can arrive
+
+        :return: None
+        """
+        self.window_size = window_size
+        self._seconds = window_size.total_seconds()
+        # The latest time key added so far
+        self.latest = None
+        # How many observations came in too late to count
+        self.late = 0
+        # Observations not yet behind the watermark, as (key, order,
+        # observation), so that ties keep the order they were added in
+        self._waiting = []
+        self._added = 0
+        self._stream = RendezvousStream(window_size)
+
+    @property
+    def watermark(self):
+        """No observation added from now on can be earlier than this
+
+        :return: A time key, or None if nothing has been added yet
+
+        :rtype: float
+        """
+        if self.latest is None:
+            return None
+        return self.latest - self._seconds
+
+    def add(self, observation):
+        """Adds the next Observation to arrive
+
+        :param Observation observation: A single observation
+
+        :return: False if it was older than the watermark, and left out
+
+        :rtype: bool
+        """
+        key = observation.key
+        if self.latest is not None and key < self.latest - self._seconds:
+            self.late += 1
+            return False
+        heappush(self._waiting, (key, self._added, observation))
+        self._added += 1
+        if self.latest is None or key > self.latest:
+            self.latest = key
+            # Everything up to the watermark is in, so pass it on
+            watermark = key - self._seconds
+            while self._waiting and self._waiting[0][0] <= watermark:
+                self._stream.add(heappop(self._waiting)[2])
+            self._stream.advance(watermark)
+        return True
+
+    def close(self):
+        """Closes every window that is still open
+
+        Call this once no more observations will arrive.
+
+        :return: None
+        """
+        while self._waiting:
+            self._stream.add(heappop(self._waiting)[2])
+        self._stream.close()
+
+    def ready(self):
+        """Yields the rendezvous of the windows that are final so far
+
+        :yield: A tuple of the two observations that met
+
+        :rtype: tuple
+
+        :raises DataError: If too many observations happen in timeframe
+        """
+        return self._stream.ready()
+
+
+def tail_lines(filename, interval=1.0, idle=None):
+    """Yields the lines of a file, then more as they are written
+
+    Only whole lines are given, so a row that is half written is held
+    back until the rest of it lands.
+
+    :param str filename: The name of the file to follow
+
+    :param float interval: Seconds to wait before looking for more
+
+    :param idle: Called with no arguments whenever the end of the file
+        is reached. If it returns True, the last partial line is given
+        as it is and no more are read.
+
+    :yield: Each line, without its line ending
+
+    :rtype: str
+
+    :raises ValueError: If the file is compressed, since only plain
+        text can be added to as it goes
+
+    :raises OSError: If there is an issue finding or opening the file
+    """
+    if compression(filename) is not None:
+        raise ValueError("Cannot follow a compressed file")
+    encoding = locale.getpreferredencoding(False)
+    partial = b''
+    with open(filename, 'rb') as f:
+        try:
+            while True:
+                data = f.read(1 << 16)
+                if not data:
+                    if idle is not None and idle():
+                        break
+                    time.sleep(interval)
+                    continue
+                lines = (partial + data).split(b'\n')
+                partial = lines.pop()
+                for line in lines:
+                    yield line.rstrip(b'\r').decode(encoding)
+        except KeyboardInterrupt:
+            # Ctrl-C is how a follow is meant to end
+            return
+    if partial:
+        yield partial.rstrip(b'\r').decode(encoding)
+
+
+def follow_rendezvous(lines, ownership, window_size=timedelta(0, 3600)):
+    """Yields rendezvous from observation rows as they arrive
+
+    Suspects listed with an item are added to ownership the first time
+    they are seen with one. Rows that arrive too late to count, and
+    rendezvous with someone not carrying anything yet, are left out
+    with a warning on stderr.
+
+    :param iterable lines: Lines of an observations CSV file, such as
+        from tail_lines
+
+    :param Ownership ownership: Who is carrying what so far
+
+    :param timedelta window_size: timeframe of observations
+
+    :yield: A tuple of the two observations that met
+
+    :rtype: tuple
+
+    :raises ValueError: If a row does not have exactly four columns,
+        or its time is not in TIME_FORMAT
+
+    :raises DataError: If too many observations happen in timeframe
+    """
+    stream = FollowStream(window_size)
+    for row in csv.reader(lines, delimiter='\n'):
+        name, location, time_string, item = split_row(row)
+        if not item == '' and name not in ownership.carrying:
+            ownership.add_suspects({name: item})
+        if not stream.add(Observation(name, location, time_string)):
+            sys.stderr.write("Skipping late observation: " +
+                             ','.join(row) + "\n")
+        for first, second in stream.ready():
+            if (first.name in ownership.carrying and
+                    second.name in ownership.carrying):
+                yield first, second
+            else:
+                sys.stderr.write("Skipping rendezvous of " + first.name +
+                                 " and " + second.name + " at " +
+                                 first.timeString + ": not carrying "
+                                 "anything yet\n")
@@ -0,0 +1,233 @@
+import bz2
+import csv
+import gzip
+import locale
+import lzma
+import mmap
+import re
+
+from observation import parse_time
+
+# How many bytes of the file to split into lines at once
+_BLOCK_SIZE = 1 << 20
+
+# Every line ending read_rows allows, as open() with newline='' does
+_LINE_END = re.compile('\r\n|\r|\n')
+
+# The bytes each compressed format we can read starts with. bzip2's
+# BZh is checked with the digit for its block size after it, so that
+# a name starting with BZh is not taken for one.
+_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'))
+_OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+def compression(filename):
+    """Works out how a file is compressed from its first few bytes
+
+    :param str filename: The name of the file
+
+    :return: 'gzip', 'bz2' or 'xz', or None if it is not compressed
+
+    :rtype: str
+
+    :raises OSError: If there is an issue finding or opening the file
+    """
+    with open(filename, 'rb') as f:
+        start = f.read(6)
+    for magic, kind in _MAGIC:
+        if start.startswith(magic):
+            return kind
+    if start[:3] == b'BZh' and start[3:4].isdigit():
+        return 'bz2'
+    return None
+
+
+def split_row(row):
+    """Splits one row of an observations CSV file into its columns
+
+    :param list row: A row from a csv.reader with a newline delimiter
+
+    :return: A (name, location, time, item) tuple
+
+    :rtype: tuple
+
+    :raises ValueError: If the row does not have exactly four columns
+    """
+    # Unpack each row (a blank line has no columns at all)
+    col = tuple(row[0].split(',')) if row else ()
+    # If too many or too few arguments, Error
+    if not len(col) == 4:
+        raise ValueError("Unpacking row error")
+    return col
+
+
+def read_rows(filename):
+    """Reads the rows of an observations CSV file
+
+    :param str filename: The name of the observations CSV file to read
+
+    :yield: A (name, location, time, item) tuple for each row
+
+    :rtype: tuple
+
+    Compressed files are decompressed as they are read.
+
+    :raises ValueError: If a row does not have exactly four columns
+
+    :raises OSError: If there is an issue finding or opening the file
+    """
+    kind = compression(filename)
+    opener = open if kind is None else _OPENERS[kind]
+    with opener(filename, 'rt', newline='') as csvfile:
+        for row in csv.reader(csvfile, delimiter='\n'):
+            yield split_row(row)
+
+
+def map_rows(filename, start=0, end=None):
+    """Reads the rows of an observations CSV file through a memory map
+
+    The mapped file is split into lines a large block at a time,
+    rather than going through a file object and the csv module line
+    by line. Compressed files are decompressed a block at a time
+    instead, without writing them out anywhere.
+
+    :param str filename: The name of the observations CSV file to read
+
+    :param int start: Byte offset of the first line to read. Only whole
+        compressed files can be read.
+
+    :param int end: Byte offset to stop reading at, or None to read to
+        the end of the file
+
+    :yield: A (name, location, time key, item) tuple for each row
+
+    :rtype: tuple
+
+    :raises ValueError: If a row does not have exactly four columns,
+        or its time is not in TIME_FORMAT
+
+    :raises OSError: If there is an issue finding or opening the file
+    """
+    return parse_blocks(_read_blocks(filename, start, end))
+
+
+def parse_blocks(blocks):
+    """Parses the rows in blocks of lines of an observations CSV file
+
+    Every row with the same name, location or item shares one copy of
+    the string, and times are turned straight into time keys. Lines
+    can end in \n, \r\n or a lone \r, as read_rows allows.
+
+    :param iterable blocks: Strings of whole lines, joined by line
+        endings
+
+    :yield: A (name, location, time key, item) tuple for each row
+
+    :rtype: tuple
+
+    :raises ValueError: If a row does not have exactly four columns,
+        or its time is not in TIME_FORMAT
+    """
+    # Maps each name, location and item to the one copy of it we keep
+    strings = {}
+    share = strings.setdefault
+
+    for block in blocks:
+        if '\r' in block:
+            # A \r at the end is from a \r\n split between blocks, or
+            # the file's last line ending
+            if block.endswith('\r'):
+                block = block[:-1]
+            lines = _LINE_END.split(block)
+        else:
+            lines = block.split('\n')
+        del block
+
+        for line in lines:
+            fields = line.split(',')
+            # If too many or too few arguments, or quoting, let the
+            # csv module sort it out like read_rows does
+            if not len(fields) == 4 or '"' in line:
+                row = next(csv.reader([line], delimiter='\n'), [])
+                fields = split_row(row)
+            name, location, time, item = fields
+            yield (share(name, name), share(location, location),
+                   parse_time(time), share(item, item) if item else '')
+
+
+def _read_blocks(filename, start, end):
+    """Reads a file a large block of whole lines at a time
+
+    :param str filename: The name of the file to read
+
+    :param int start: Byte offset of the first line to read
+
+    :param int end: Byte offset to stop reading at, or None
+
+    :yield: Each block, decoded, without the newline after it
+
+    :rtype: str
+    """
+    # Decode the same way open() does in text mode
+    encoding = locale.getpreferredencoding(False)
+    kind = compression(filename)
+    if kind is not None:
+        if start or end is not None:
+            raise ValueError("Cannot read part of a compressed file")
+        yield from _decompress_blocks(filename, kind, encoding)
+        return
+
+    with open(filename, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped, and don't have any rows
+            return
+
+    with data:
+        if end is None:
+            end = len(data)
+        while start < end:
+            # Work on a large block of whole lines at a time
+            stop = min(start + _BLOCK_SIZE, end)
+            if stop < end:
+                stop = data.rfind(b'\n', start, stop)
+                if stop == -1:
+                    stop = data.find(b'\n', start + _BLOCK_SIZE, end)
+                    if stop == -1:
+                        stop = end
+            block = data[start:stop].decode(encoding)
+            start = stop + 1
+            if stop == end and block.endswith('\n'):
+                block = block[:-1]
+            yield block
+
+
+def _decompress_blocks(filename, kind, encoding):
+    """Decompresses a file a large block of whole lines at a time
+
+    :param str filename: The name of the compressed file
+
+    :param str kind: How it is compressed, from compression()
+
+    :param str encoding: What to decode the lines with
+
+    :yield: Each block, decoded, without the newline after it
+
+    :rtype: str
+    """
+    partial = b''
+    with _OPENERS[kind](filename, 'rb') as f:
+        while True:
+            data = f.read(_BLOCK_SIZE)
+            if not data:
+                break
+            data = partial + data
+            stop = data.rfind(b'\n')
+            if stop == -1:
+                partial = data
+                continue
+            partial = data[stop + 1:]
+            yield data[:stop].decode(encoding)
+    if partial:
+        yield partial.decode(encoding)
@@ -0,0 +1,298 @@
+import tempfile
+from collections import deque
+from datetime import timedelta
+from heapq import merge
+from itertools import islice, takewhile
+from operator import attrgetter
+
+from observation import Observation, time_key
+from observation_timeline import DataError, count_windows
+
+
+class RendezvousStream:
+    def __init__(self, window_size=timedelta(0, 3600), start=None,
+                 end=None):
+        """Constructor for a RendezvousStream
+
+        Finds the same rendezvous as ObservationTimeline.rendezvous,
+        but for observations that are added in time order. Only the
+        observations whose window is still open are kept around.
+
+        :param timedelta window_size: timeframe of observations
+
+        :param datetime start: Only look at windows starting at or
+            after this time, if given
+
+        :param datetime end: Only look at windows starting before this
+            time, if given
+
+        :return: None
+        """
+        self.window_size = window_size
+        # The window size and range in seconds, to compare with time keys
+        self._seconds = window_size.total_seconds()
+        self._start = None if start is None else time_key(start)
+        self._end = None if end is None else time_key(end)
+        # The latest time key added or advanced to so far
+        self._latest = None
+        # Observations whose window hasn't closed yet, in order
+        self._pending = deque()
+        # Maps each location to its pending observations, in order
+        self._locations = {}
+        # Closed windows' rendezvous, or None for a crowded window
+        self._ready = deque()
+        # How many windows in the range have closed, and how many other
+        # observations were found in them, as count_windows() counts
+        self.windows = 0
+        self.comparisons = 0
+
+    def add(self, observation):
+        """Adds the next Observation to the stream
+
+        Closes every window that started window_size or more before
+        the observation, since nothing added later can be in them.
+
+        :param Observation observation: A single observation, no
+            earlier than any observation added before it
+
+        :return: None
+
+        :raises ValueError: If the observation is out of order
+        """
+        self.advance(observation.key)
+        self._pending.append(observation)
+        self._locations.setdefault(observation.location,
+                                   deque()).append(observation)
+
+    def advance(self, key):
+        """Moves the stream on to a time, without adding anything
+
+        Closes every window that started window_size or more before
+        it, for when nothing earlier can be added any more.
+
+        :param float key: A time key, no earlier than any observation
+            added or time advanced to before
+
+        :return: None
+
+        :raises ValueError: If the time is out of order
+        """
+        if self._latest is not None and key < self._latest:
+            raise ValueError("Observations must be added in time order")
+        self._latest = key
+        self._close(key - self._seconds)
+
+    def close(self):
+        """Closes every window that is still open
+
+        Call this once the last observation has been added.
+
+        :return: None
+        """
+        self._close(None)
+
+    def ready(self):
+        """Yields the rendezvous of the windows closed so far
+
+        :yield: A tuple of the two observations that met
+
+        :rtype: tuple
+
+        :raises DataError: If too many observations happen in timeframe
+        """
+        while self._ready:
+            rend = self._ready.popleft()
+            if rend is None:
+                raise DataError("Can only have one rendezvous in a window")
+            yield rend
+
+    def _close(self, until):
+        """Closes the windows starting no later than a given time
+
+        :param float until: Latest start of a window to close, as a
+            time key, or
+            None to close them all
+
+        :return: None
+        """
+        while self._pending and (until is None or
+                                 self._pending[0].key <= until):
+            first = self._pending.popleft()
+            # The first pending observation is also first at its location
+            at_location = self._locations[first.location]
+            at_location.popleft()
+            if ((self._start is not None and first.key < self._start) or
+                    (self._end is not None and first.key >= self._end)):
+                if not at_location:
+                    del self._locations[first.location]
+                continue
+            limit = first.key + self._seconds
+            # Two is already too many, so don't look any further
+            met = list(islice(takewhile(lambda o: o.key < limit,
+                                        at_location), 2))
+            self.windows += 1
+            self.comparisons += len(met)
+            if len(met) == 1:
+                self._ready.append((first, met[0]))
+            elif len(met) > 1:
+                self._ready.append(None)
+            if not at_location:
+                del self._locations[first.location]
+
+
+class DuplicateFilter:
+    def __init__(self):
+        """Constructor for a DuplicateFilter
+
+        Drops observations equal to one already let through, and
+        counts how many were dropped.
+
+        :return: None
+        """
+        # How many duplicates have been dropped so far, by every filter()
+        self.dropped = 0
+
+    def filter(self, observations, in_order=False):
+        """Yields the observations that haven't been seen before
+
+        Observations seen are kept in a hash set. Each call starts a
+        new set, so only duplicates within the one iterable are found.
+
+        :param iterable observations: Observations
+
+        :param bool in_order: Whether the observations are in time
+            order. Duplicates are then next to each other in time, so
+            only the observations made at the latest time are kept in
+            the set, instead of every one seen.
+
+        :yield: Each new observation, in the same order
+
+        :rtype: Observation
+        """
+        seen = set()
+        key = None
+        for observation in observations:
+            if in_order and not observation.key == key:
+                seen.clear()
+                key = observation.key
+            # Adding and checking the size only hashes it the once
+            size = len(seen)
+            seen.add(observation)
+            if len(seen) == size:
+                self.dropped += 1
+                continue
+            yield observation
+
+
+def stream_rendezvous(observations, window_size=timedelta(0, 3600),
+                      start=None, end=None, counts=None):
+    """Yields the rendezvous in observations that arrive in time order
+
+    :param iterable observations: Observations in time order
+
+    :param timedelta window_size: timeframe of observations
+
+    :param datetime start: Only look at windows starting at or after
+        this time, if given
+
+    :param datetime end: Only look at windows starting before this
+        time, if given. No more observations are read once those
+        windows have all closed.
+
+    :param dict counts: Where to count the windows looked at, once
+        they all have been, if desired. See count_windows().
+
+    :yield: A tuple of the two observations that met
+
+    :rtype: tuple
+
+    :raises DataError: If too many observations happen in timeframe
+    """
+    stream = RendezvousStream(window_size, start, end)
+    # Observations from here on can't be in any window in the range
+    limit = None if end is None else time_key(end + window_size)
+    for observation in observations:
+        if limit is not None and observation.key >= limit:
+            break
+        stream.add(observation)
+        yield from stream.ready()
+    stream.close()
+    yield from stream.ready()
+    count_windows(counts, stream.windows, stream.comparisons)
+
+
+def external_sort(observations, run_size=100000, fan_in=64):
+    """Yields observations in time order without holding them all
+
+    Sorts runs of run_size observations in memory and spills them to
+    temporary files, then merges the runs. Observations made at the
+    same time stay in the order they arrived.
+
+    :param iterable observations: Observations in any order
+
+    :param int run_size: Most observations to sort in memory at once
+
+    :param int fan_in: Most runs to merge at once
+
+    :yield: Each observation, in time order
+
+    :rtype: Observation
+    """
+    runs = []
+    batch = []
+    for observation in observations:
+        batch.append(observation)
+        if len(batch) == run_size:
+            batch.sort(key=attrgetter('key'))
+            runs.append(_spill(batch))
+            batch = []
+    batch.sort(key=attrgetter('key'))
+    # Everything fit in one batch, so there's nothing to merge
+    if not runs:
+        yield from batch
+        return
+    if batch:
+        runs.append(_spill(batch))
+    # Merge neighbouring runs until there are few enough to open at once
+    while len(runs) > fan_in:
+        runs = [_spill(_merge_runs(runs[i:i + fan_in]))
+                for i in range(0, len(runs), fan_in)]
+    yield from _merge_runs(runs)
+
+
+def _spill(observations):
+    """Writes sorted observations to a temporary file
+
+    :param iterable observations: Observations in time order
+
+    :return: The file, rewound to the start
+
+    :rtype: file
+    """
+    run = tempfile.TemporaryFile(mode='w+', newline='')
+    for o in observations:
+        run.write(o.name + ',' + o.location + ',' + str(o.key) + '\n')
+    run.seek(0)
+    return run
+
+
+def _merge_runs(runs):
+    """Merges runs written by _spill, closing them as they run out
+
+    :param list runs: Files of sorted observations, in arrival order
+
+    :yield: Each observation, in time order
+
+    :rtype: Observation
+    """
+    def read_run(run, index):
+        with run:
+            for position, line in enumerate(run):
+                name, location, key = line.rstrip('\n').split(',')
+                o = Observation.from_epoch(name, location, int(key))
+                # Ties go to the earlier run, then the earlier line
+                yield o.key, index, position, o
+
+    for _, _, _, o in merge(*[read_run(run, i)
+                              for i, run in enumerate(runs)]):
+        yield o
@@ -1,4 +1,9 @@
+from bisect import bisect_left, bisect_right, insort
 from datetime import timedelta
+from heapq import merge
+from operator import attrgetter
+
+from observation import time_key
 
 
 class DataError(Exception):
@@ -7,6 +12,28 @@ class DataError(Exception):
     pass
 
 
+def count_windows(counts, windows, comparisons):
+    """Adds to the counters of a rendezvous search, if it was given any
+
+    :param dict counts: Maps 'windows generated' and 'pairwise
+        comparisons' to running totals, such as Profile.counters, or
+        None not to count anything
+
+    :param int windows: How many windows were looked at, one for each
+        observation a window started at
+
+    :param int comparisons: How many other observations at the same
+        location were found in those windows. Counting stops at two,
+        since a window with more is already an error.
+
+    :return: None
+    """
+    if counts is not None:
+        for name, amount in (('windows generated', windows),
+                             ('pairwise comparisons', comparisons)):
+            counts[name] = counts.get(name, 0) + amount
+
+
 class ObservationTimeline:
     def __init__(self):
         """Constructor for an ObservationTimeline
@@ -16,51 +43,290 @@ class ObservationTimeline:
         :return: None
         """
         self.observations = []
+        # Time keys of the observations, kept in step with the
+        # observations list so we can binary search it
+        self._times = []
+        # Maps each location to a sorted list of (time key, order added,
+        # observation) tuples for the observations made there
+        self._locations = {}
+        # Same again for each suspect's name
+        self._suspects = {}
+        # How many observations have been added, used to order ties
+        self._added = 0
+
+    @classmethod
+    def from_iterable(cls, observations):
+        """Builds an ObservationTimeline from many observations at once
+
+        :param iterable observations: Observations in any order
+
+        :return: A new timeline holding the observations
+
+        :rtype: ObservationTimeline
+        """
+        timeline = cls()
+        timeline.add_many(observations)
+        return timeline
+
+    def __len__(self):
+        """How many observations are in the timeline
+
+        :rtype: int
+        """
+        return len(self._times)
+
+    def __iter__(self):
+        """Goes through every observation, in time order
+
+        :rtype: iterator
+        """
+        return iter(self.observations)
+
+    def location_entries(self, window_size=timedelta(0, 3600), start=None,
+                         end=None):
+        """The observations at each location that windows in a time
+        range can see
+
+        With no range, this is the location index itself. Otherwise
+        only the observations from start up to window_size after end
+        are grouped by location, found by binary search, so a narrow
+        range doesn't cost a look at every location.
+
+        :param timedelta window_size: timeframe of observations
+
+        :param datetime start: Only include windows starting at or
+            after this time, if given
+
+        :param datetime end: Only include windows starting before this
+            time, if given
+
+        :return: A list of (entries, windows) tuples, one for each
+            location with a window in the range. The entries are sorted
+            (time key, order, observation) tuples, and the windows in
+            the range start at the first windows of them. Orders are
+            only comparable within one call. The lists shouldn't be
+            changed.
+
+        :rtype: list
+        """
+        if start is None and end is None:
+            return [(entries, len(entries))
+                    for entries in self._locations.values()]
+        times = self._times
+        first = 0 if start is None else bisect_left(times, time_key(start))
+        last = len(times)
+        reach = len(times)
+        if end is not None:
+            last = bisect_left(times, time_key(end))
+            reach = bisect_left(times, time_key(end) +
+                                window_size.total_seconds())
+        # Positions in the observations list are in the same order as
+        # (time key, order added), so they can stand in for it
+        locations = {}
+        for i in range(first, last):
+            o = self.observations[i]
+            locations.setdefault(o.location, []).append((o.key, i, o))
+        windows = {location: len(entries)
+                   for location, entries in locations.items()}
+        # Windows in the range can reach past end
+        for i in range(last, reach):
+            o = self.observations[i]
+            entries = locations.get(o.location)
+            if entries is not None:
+                entries.append((o.key, i, o))
+        return [(entries, windows[location])
+                for location, entries in locations.items()]
 
     def add(self, observation):
         """Adds an Observation to the observations list
 
+        Observations made at the same time stay in the order
+        they were added.
+
         :param Observation observation: A single observation
 
         :return: None
         """
-        index = 0
-        for x in self.observations:
-            # Puts observations in order
-            if observation.time < x.time:
-                self.observations.insert(index, observation)
-                break
-            index += 1
-        else:
-            # Puts observation in the back
-            self.observations.append(observation)
-
-    def windows(self, window_size=timedelta(0, 3600)):
+        # Find the slot after every observation with the same time
+        index = bisect_right(self._times, observation.key)
+        self._times.insert(index, observation.key)
+        self.observations.insert(index, observation)
+        # Keep the location and suspect indexes up to date
+        entry = (observation.key, self._added, observation)
+        insort(self._locations.setdefault(observation.location, []), entry)
+        insort(self._suspects.setdefault(observation.name, []), entry)
+        self._added += 1
+
+    def add_many(self, observations):
+        """Adds a batch of Observations to the observations list
+
+        Ends up in the same order as calling add() on each
+        observation in turn. Only the batch is sorted, and it is merged
+        into the part of each list from its earliest time on, so a
+        batch that comes after most of the timeline costs little more
+        than the batch itself.
+
+        :param iterable observations: Observations in any order
+
+        :return: None
+        """
+        # A stable sort, so ties stay in the order they were given
+        batch = sorted(observations, key=attrgetter('key'))
+        if not batch:
+            return
+        # Everything from the first slot the batch can go in, which is
+        # after every observation made at the batch's earliest time
+        first = bisect_right(self._times, batch[0].key)
+        tail = batch
+        if first < len(self._times):
+            tail = list(merge(self.observations[first:], batch,
+                              key=attrgetter('key')))
+        self.observations[first:] = tail
+        self._times[first:] = [o.key for o in tail]
+        # Same again for each location and suspect the batch touches
+        locations = {}
+        suspects = {}
+        for o in batch:
+            entry = (o.key, self._added, o)
+            locations.setdefault(o.location, []).append(entry)
+            suspects.setdefault(o.name, []).append(entry)
+            self._added += 1
+        for index, added in ((self._locations, locations),
+                             (self._suspects, suspects)):
+            for group, entries in added.items():
+                existing = index.setdefault(group, [])
+                at = bisect_left(existing, entries[0])
+                if at < len(existing):
+                    entries = list(merge(existing[at:], entries))
+                existing[at:] = entries
+
+    def between(self, start, end):
+        """The observations made from one time up to another
+
+        :param datetime start: The earliest time to include
+
+        :param datetime end: The time to stop at. Observations made at
+            this time are left out.
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return self.observations[bisect_left(self._times, time_key(start)):
+                                 bisect_left(self._times, time_key(end))]
+
+    def before(self, time):
+        """The observations made before a time
+
+        :param datetime time: The time to stop at, which is left out
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return self.observations[:bisect_left(self._times, time_key(time))]
+
+    def after(self, time):
+        """The observations made at or after a time
+
+        Together with before(time), this covers every observation.
+
+        :param datetime time: The earliest time to include
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return self.observations[bisect_left(self._times, time_key(time)):]
+
+    def trajectory(self, name, start=None, end=None):
+        """Where a suspect was seen, from one time up to another
+
+        Found by binary search in the suspect's own observations.
+
+        :param str name: The suspect's name
+
+        :param datetime start: The earliest time to include, if given
+
+        :param datetime end: The time to stop at, if given. Observations
+            made at this time are left out.
+
+        :return: The suspect's observations, in time order
+
+        :rtype: list
+        """
+        entries = self._suspects.get(name, [])
+        # A lone time key sorts before every entry made at that time
+        first = 0 if start is None else bisect_left(entries,
+                                                    (time_key(start),))
+        last = (len(entries) if end is None else
+                bisect_left(entries, (time_key(end),)))
+        return [entry[2] for entry in entries[first:last]]
+
+    def window_ranges(self, window_size=timedelta(0, 3600),
+                      skip_singletons=False):
+        """Yields the index range of every window in the observations list
+
+        The window starting at observations[start] holds every later
+        observation made less than window_size after it. Since the
+        list is sorted, that is the slice observations[start:end].
+
+        :param timedelta window_size: timeframe
+
+        :param bool skip_singletons: Skip windows with only one observation
+
+        :yield: A (start, end) tuple of indices into the observations list
+
+        :rtype: tuple
+        """
+        times = self._times
+        seconds = window_size.total_seconds()
+        end = 0
+        for start in range(len(times)):
+            # A window ends no earlier than the window before it did
+            end = max(end, start + 1)
+            limit = times[start] + seconds
+            while end < len(times) and times[end] < limit:
+                end += 1
+            if skip_singletons and end - start == 1:
+                continue
+            yield start, end
+
+    def windows(self, window_size=timedelta(0, 3600), skip_singletons=False):
         """Yields all observations that happen within
         a specified timeframe from the first observation
 
         :param timedelta window_size: timeframe
 
+        :param bool skip_singletons: Skip windows with only one observation
+
         :yield: A tuple of the observations in timeframe
         from first observation
 
         :rtype: tuple
         """
-        for i in range(len(self.observations)):
-            # Add initial observation to tuple
-            window = (self.observations[i],)
-            # If observation is within timeframe, add it to the tuple
-            for j in range(i+1, len(self.observations)):
-                if (self.observations[j].time -
-                   self.observations[i].time < window_size):
-                    window += (self.observations[j],)
-            yield window
-
-    def rendezvous(self, window_size=timedelta(0, 3600)):
+        for start, end in self.window_ranges(window_size, skip_singletons):
+            yield tuple(self.observations[start:end])
+
+    def rendezvous(self, window_size=timedelta(0, 3600), start=None,
+                   end=None, counts=None):
         """Sees if two agents rendeviwed or not
 
+        Only the windows in the time range are looked at, found by
+        binary search, although they can still hold observations made
+        after end.
+
         :param timedelta window_size: timeframe of observations
 
+        :param datetime start: Only look at windows starting at or
+            after this time, if given
+
+        :param datetime end: Only look at windows starting before this
+            time, if given
+
+        :param dict counts: Where to count the windows looked at, if
+            desired. See count_windows().
+
         :returns: A tuple with the following items:
 
                 - First observation
@@ -77,21 +343,55 @@ class ObservationTimeline:
         :raises DataError: If too many observations happen in timeframe
 
         """
-        for window in self.windows():
-            # create tuples without the starting tuple in window
-            win = iter(window)
-            next(win)
-            rend = (window[0],)
-            # See if the agents were in the same location at the same time
-            for w in win:
-                if window[0].location == w.location:
-                    rend += (w,)
+        seconds = window_size.total_seconds()
+        # Only observations at the same location can meet, so scan each
+        # location on its own and merge the results back in time order
+        for key, rend in merge(*[
+                self._location_rendezvous(entries, seconds, windows, counts)
+                for entries, windows in self.location_entries(
+                    window_size, start, end)]):
             # If 3 agents are at the same place at the same time, raise Error
-            if len(rend) > 2:
+            if rend is None:
                 raise DataError("Can only have one rendezvous in a window")
-            # If no two agents were in the same place, skip this iteration
-            elif len(rend) == 1:
-                continue
             # Returns a tuple of two items of the two observations
-            else:
-                yield rend
+            yield rend
+
+    @staticmethod
+    def _location_rendezvous(entries, seconds, stop=None, counts=None):
+        """Yields the rendezvous at a single location
+
+        :param list entries: Sorted (time key, order added, observation)
+            tuples for one location
+
+        :param float seconds: timeframe of observations, in seconds
+
+        :param int stop: Index of the window to stop at, or None to
+            look at every window
+
+        :param dict counts: Where to count the windows looked at, once
+            they all have been, if desired. See count_windows().
+
+        :yield: A tuple of the window's (time key, order added) and
+            either the rendezvous or None if the window has too many
+            observations
+
+        :rtype: tuple
+        """
+        if stop is None:
+            stop = len(entries)
+        end = 0
+        comparisons = 0
+        for start in range(stop):
+            key, added, first = entries[start]
+            # A window ends no earlier than the window before it did
+            end = max(end, start + 1)
+            limit = key + seconds
+            while end < len(entries) and entries[end][0] < limit:
+                end += 1
+            if end - start == 2:
+                comparisons += 1
+                yield (key, added), (first, entries[start + 1][2])
+            elif end - start > 2:
+                comparisons += 2
+                yield (key, added), None
+        count_windows(counts, stop, comparisons)
@@ -0,0 +1,334 @@
+import csv
+import io
+import json
+import pprint
+import sys
+
+
+class TextWriter:
+    def __init__(self, stream):
+        """Constructor for a TextWriter
+
+        Writes results the way the tracker always has, for people to
+        read.
+
+        :param stream: A text file to write to
+
+        :return: None
+        """
+        self.stream = stream
+
+    def exchange(self, first, second, first_item, second_item):
+        """Writes an exchange as it happens
+
+        :param Observation first: The first suspect's observation
+
+        :param Observation second: The second suspect's observation
+
+        :param str first_item: What the first suspect handed over
+
+        :param str second_item: What the second suspect handed over
+
+        :return: None
+        """
+        self.stream.write(first.name + " meets with " + second.name +
+                          " to exchange " + first_item + " for " +
+                          second_item + ".\n")
+
+    def carrying(self, carrying, at=None):
+        """Writes who is carrying what
+
+        :param dict carrying: Maps each suspect's name to their item
+
+        :param str at: The time this was true at, or None for the end
+
+        :return: None
+        """
+        pprint.pprint(carrying, stream=self.stream, indent=4)
+
+    def owner(self, name, item, at=None):
+        """Writes that a suspect had an item
+
+        :param str name: The suspect's name
+
+        :param str item: The item they had
+
+        :param str at: The time they had it at, or None for the end
+
+        :return: None
+        """
+        if at is None:
+            self.stream.write(name + " had the " + item + "\n")
+        else:
+            self.stream.write(name + " had the " + item + " at " + at +
+                              "\n")
+
+    def transfer(self, item, at, old, new, location):
+        """Writes that an item changed hands
+
+        :param str item: The item
+
+        :param str at: The time it changed hands
+
+        :param str old: The suspect who handed it over
+
+        :param str new: The suspect who got it
+
+        :param str location: Where it changed hands
+
+        :return: None
+        """
+        self.stream.write(item + " went from " + old + " to " + new +
+                          " at " + location + " (" + at + ")\n")
+
+    def observation(self, observation):
+        """Writes where a suspect was seen
+
+        :param Observation observation: The observation
+
+        :return: None
+        """
+        self.stream.write(observation.name + " was at " +
+                          observation.location + " at " +
+                          observation.timeString + "\n")
+
+    def flush(self):
+        """Writes out anything still buffered
+
+        :return: None
+        """
+        self.stream.flush()
+
+    def close(self):
+        """Flushes out anything still buffered, once done writing
+
+        :return: None
+        """
+        self.flush()
+
+
+class JsonLinesWriter(TextWriter):
+    def __init__(self, stream):
+        """Constructor for a JsonLinesWriter
+
+        Writes each result as a JSON object on a line of its own, with
+        a "type" of "exchange", "carrying", "owner", "transfer" or
+        "observation".
+
+        :param stream: A text file to write to
+
+        :return: None
+        """
+        super().__init__(stream)
+        self._encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    def exchange(self, first, second, first_item, second_item):
+        """Writes an exchange as a JSON line
+
+        :param Observation first: The first suspect's observation
+
+        :param Observation second: The second suspect's observation
+
+        :param str first_item: What the first suspect handed over
+
+        :param str second_item: What the second suspect handed over
+
+        :return: None
+        """
+        self._write({'type': 'exchange', 'time': first.timeString,
+                     'location': first.location, 'first': first.name,
+                     'second': second.name, 'first_item': first_item,
+                     'second_item': second_item})
+
+    def carrying(self, carrying, at=None):
+        """Writes a JSON line for each suspect and what they carry
+
+        :param dict carrying: Maps each suspect's name to their item
+
+        :param str at: The time this was true at, or None for the end
+
+        :return: None
+        """
+        for name, item in carrying.items():
+            self._write({'type': 'carrying', 'time': at, 'name': name,
+                         'item': item})
+
+    def owner(self, name, item, at=None):
+        """Writes that a suspect had an item, as a JSON line
+
+        :param str name: The suspect's name
+
+        :param str item: The item they had
+
+        :param str at: The time they had it at, or None for the end
+
+        :return: None
+        """
+        self._write({'type': 'owner', 'time': at, 'name': name,
+                     'item': item})
+
+    def transfer(self, item, at, old, new, location):
+        """Writes that an item changed hands, as a JSON line
+
+        :param str item: The item
+
+        :param str at: The time it changed hands
+
+        :param str old: The suspect who handed it over
+
+        :param str new: The suspect who got it
+
+        :param str location: Where it changed hands
+
+        :return: None
+        """
+        self._write({'type': 'transfer', 'time': at, 'location': location,
+                     'item': item, 'from': old, 'to': new})
+
+    def observation(self, observation):
+        """Writes where a suspect was seen, as a JSON line
+
+        :param Observation observation: The observation
+
+        :return: None
+        """
+        self._write({'type': 'observation', 'time': observation.timeString,
+                     'location': observation.location,
+                     'name': observation.name})
+
+    def _write(self, record):
+        """Writes one record
+
+        :param dict record: The record
+
+        :return: None
+        """
+        self.stream.write(self._encode(record) + "\n")
+
+
+class CsvWriter(TextWriter):
+    COLUMNS = ('type', 'time', 'location', 'name', 'item', 'other_name',
+               'other_item')
+    """The header row. Exchanges fill in every column. Transfers leave
+    other_item empty, with the old owner as name and the new one as
+    other_name. Observations leave the item columns empty, and the
+    others leave the location and other suspect's columns empty."""
+
+    def __init__(self, stream):
+        """Constructor for a CsvWriter
+
+        Writes each result as a row of a CSV file, with a "type" of
+        "exchange", "carrying", "owner", "transfer" or "observation". The
+        header row is written straight away.
+
+        :param stream: A text file to write to
+
+        :return: None
+        """
+        super().__init__(stream)
+        self._writerow = csv.writer(stream, lineterminator='\n').writerow
+        self._writerow(self.COLUMNS)
+
+    def exchange(self, first, second, first_item, second_item):
+        """Writes an exchange as a CSV row
+
+        :param Observation first: The first suspect's observation
+
+        :param Observation second: The second suspect's observation
+
+        :param str first_item: What the first suspect handed over
+
+        :param str second_item: What the second suspect handed over
+
+        :return: None
+        """
+        self._writerow(('exchange', first.timeString, first.location,
+                        first.name, first_item, second.name, second_item))
+
+    def carrying(self, carrying, at=None):
+        """Writes a CSV row for each suspect and what they carry
+
+        :param dict carrying: Maps each suspect's name to their item
+
+        :param str at: The time this was true at, or None for the end
+
+        :return: None
+        """
+        for name, item in carrying.items():
+            self._writerow(('carrying', at or '', '', name, item, '', ''))
+
+    def owner(self, name, item, at=None):
+        """Writes that a suspect had an item, as a CSV row
+
+        :param str name: The suspect's name
+
+        :param str item: The item they had
+
+        :param str at: The time they had it at, or None for the end
+
+        :return: None
+        """
+        self._writerow(('owner', at or '', '', name, item, '', ''))
+
+    def transfer(self, item, at, old, new, location):
+        """Writes that an item changed hands, as a CSV row
+
+        :param str item: The item
+
+        :param str at: The time it changed hands
+
+        :param str old: The suspect who handed it over
+
+        :param str new: The suspect who got it
+
+        :param str location: Where it changed hands
+
+        :return: None
+        """
+        self._writerow(('transfer', at, location, old, item, new, ''))
+
+    def observation(self, observation):
+        """Writes where a suspect was seen, as a CSV row
+
+        :param Observation observation: The observation
+
+        :return: None
+        """
+        self._writerow(('observation', observation.timeString,
+                        observation.location, observation.name, '', '', ''))
+
+
+FORMATS = {
+    'text': TextWriter,
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+}
+"""The output writers that main can use, by name"""
+
+
+def open_writer(name, stream=None):
+    """Makes an output writer for a format
+
+    The machine-readable formats go through their own large buffer,
+    since they are meant for piping millions of records into other
+    programs. Text goes straight to the stream as it always has.
+
+    :param str name: The name of the format in FORMATS
+
+    :param stream: A text file to write to. Defaults to stdout.
+
+    :return: The writer. Call its close() method when done.
+    """
+    if stream is None:
+        stream = sys.stdout
+    if not name == 'text':
+        try:
+            fileno = stream.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            # Not a real file, so there's nothing to gain
+            return FORMATS[name](stream)
+        stream.flush()
+        # Leave the file itself open when this one is closed
+        stream = open(fileno, 'w', buffering=1 << 20,
+                      encoding=stream.encoding, newline='', closefd=False)
+    return FORMATS[name](stream)
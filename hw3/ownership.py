@@ -0,0 +1,242 @@
+from bisect import bisect_right
+
+
+class Ownership:
+    def __init__(self, carrying, checkpoint_every=1024, history=True):
+        """Constructor for an Ownership
+
+        Keeps track of who is carrying what as items change hands,
+        indexed both ways so either question is a quick lookup.
+
+        Every exchange is recorded, along with a copy of who was
+        carrying what every checkpoint_every exchanges, so that past
+        owners can be looked up without replaying everything.
+
+        :param dict carrying: Maps each suspect's name to the item they
+            are carrying. It is updated in place as items change hands.
+
+        :param int checkpoint_every: How many exchanges to record
+            between copies of carrying
+
+        :param bool history: Whether to record exchanges at all. Without
+            them, memory doesn't grow with every exchange, but there is
+            no looking back with carrying_at(), owners_at(),
+            provenance() or rewind().
+
+        :return: None
+        """
+        self.carrying = carrying
+        self.checkpoint_every = checkpoint_every
+        self.history = history
+        # The time key and the two names of each exchange, in order
+        self._times = []
+        self._exchanges = []
+        # carrying before exchange 0, checkpoint_every, 2 * ..., and so on
+        self._checkpoints = [dict(carrying)]
+        # Maps each item to a (time key, old owner, new owner, location,
+        # exchange number) tuple for each time it changed hands, in order
+        self._transfers = {}
+        self._index()
+
+    def __len__(self):
+        """How many exchanges have been made
+
+        :rtype: int
+        """
+        return len(self._exchanges)
+
+    def exchange(self, first, second):
+        """Swaps the items of the two suspects in a rendezvous
+
+        :param Observation first: The first suspect's observation
+
+        :param Observation second: The second suspect's observation
+
+        :return: None
+
+        :raises KeyError: If either suspect isn't carrying anything
+        """
+        first_item = self.carrying[first.name]
+        second_item = self.carrying[second.name]
+        # Record the exchange, taking a checkpoint first if it's time
+        if self.history:
+            if len(self._exchanges) == (len(self._checkpoints) *
+                                        self.checkpoint_every):
+                self._checkpoints.append(dict(self.carrying))
+            self._times.append(first.key)
+            self._exchanges.append((first.name, second.name))
+        if first_item == second_item:
+            return
+        if self.history:
+            number = len(self._exchanges) - 1
+            self._transfers.setdefault(first_item, []).append(
+                (first.key, first.name, second.name, first.location, number))
+            self._transfers.setdefault(second_item, []).append(
+                (first.key, second.name, first.name, first.location,
+                 number))
+        self._move(first_item, first.name, second.name)
+        self._move(second_item, second.name, first.name)
+        self.carrying[first.name] = second_item
+        self.carrying[second.name] = first_item
+
+    def owners(self, item):
+        """The suspects currently carrying an item
+
+        :param str item: The item to look up
+
+        :return: Their names, in the same order as in carrying
+
+        :rtype: list
+        """
+        return sorted(self._owners.get(item, ()), key=self._order.get)
+
+    def add_suspects(self, carrying):
+        """Starts tracking suspects that weren't carrying anything before
+
+        Since they had nothing, they can't have been in any exchanges
+        yet, so they are treated as having carried their item all along.
+
+        :param dict carrying: Maps each new suspect's name to their item
+
+        :return: None
+
+        :raises ValueError: If a suspect is already being tracked
+        """
+        for name, item in carrying.items():
+            if name in self.carrying:
+                raise ValueError(name + " is already carrying something")
+            for checkpoint in self._checkpoints:
+                checkpoint[name] = item
+            self.carrying[name] = item
+            self._owners.setdefault(item, set()).add(name)
+            self._order[name] = len(self._order)
+
+    def rewind(self, count):
+        """Undoes every exchange after the first count of them
+
+        :param int count: How many exchanges to keep
+
+        :return: None
+        """
+        carrying = self._carrying_after(count)
+        del self._times[count:]
+        del self._exchanges[count:]
+        del self._checkpoints[count // self.checkpoint_every + 1:]
+        for item in list(self._transfers):
+            transfers = self._transfers[item]
+            while transfers and transfers[-1][4] >= count:
+                transfers.pop()
+            if not transfers:
+                del self._transfers[item]
+        # Keep the same dictionary, since others may be holding on to it
+        self.carrying.clear()
+        self.carrying.update(carrying)
+        self._index()
+
+    def carrying_at(self, key):
+        """Who was carrying what at a point in time
+
+        An exchange counts from the time of the first observation of
+        its rendezvous.
+
+        :param int key: The time to look at, in seconds since the epoch
+
+        :return: Maps each suspect's name to the item they carried
+
+        :rtype: dict
+        """
+        return self._carrying_after(bisect_right(self._times, key))
+
+    def owners_at(self, item, key):
+        """The suspects carrying an item at a point in time
+
+        :param str item: The item to look up
+
+        :param int key: The time to look at, in seconds since the epoch
+
+        :return: Their names, in the same order as in carrying
+
+        :rtype: list
+        """
+        checkpoint, exchanges = self._since_checkpoint(
+            bisect_right(self._times, key))
+        owners = {name for name, carried in checkpoint.items()
+                  if carried == item}
+        # Only an exchange between an owner and a non-owner moves it
+        for first, second in exchanges:
+            if (first in owners) != (second in owners):
+                owners.symmetric_difference_update((first, second))
+        return sorted(owners, key=self._order.get)
+
+    def provenance(self, item):
+        """Every time an item changed hands, in order
+
+        The transfers are recorded as the exchanges are made, so this
+        is only a lookup.
+
+        :param str item: The item to look up
+
+        :return: A (time key, old owner, new owner, location) tuple
+            for each transfer
+
+        :rtype: list
+        """
+        return [transfer[:4] for transfer in self._transfers.get(item, ())]
+
+    def _carrying_after(self, count):
+        """Who was carrying what after a number of exchanges
+
+        :param int count: How many exchanges to replay
+
+        :return: Maps each suspect's name to the item they carried
+
+        :rtype: dict
+        """
+        checkpoint, exchanges = self._since_checkpoint(count)
+        carrying = dict(checkpoint)
+        for first, second in exchanges:
+            carrying[first], carrying[second] = (carrying[second],
+                                                 carrying[first])
+        return carrying
+
+    def _since_checkpoint(self, count):
+        """Finds the last checkpoint before a number of exchanges
+
+        :param int count: How many exchanges to replay
+
+        :return: The checkpoint's copy of carrying, and a list of the
+            exchanges made after it, up to the count
+
+        :rtype: tuple
+        """
+        checkpoint = min(count // self.checkpoint_every,
+                         len(self._checkpoints) - 1)
+        return (self._checkpoints[checkpoint],
+                self._exchanges[checkpoint * self.checkpoint_every:count])
+
+    def _index(self):
+        """Rebuilds the item to owners index from carrying
+
+        :return: None
+        """
+        # Maps each item to the names of the suspects carrying it
+        self._owners = {}
+        for name, item in self.carrying.items():
+            self._owners.setdefault(item, set()).add(name)
+        # Where each suspect is in carrying, to list owners in that order
+        self._order = {name: i for i, name in enumerate(self.carrying)}
+
+    def _move(self, item, old, new):
+        """Moves an item from one owner to another in the index
+
+        :param str item: The item that changed hands
+
+        :param str old: The name of who had it
+
+        :param str new: The name of who has it now
+
+        :return: None
+        """
+        owners = self._owners[item]
+        owners.discard(old)
+        owners.add(new)
@@ -0,0 +1,362 @@
+import gzip
+import locale
+import mmap
+import os
+import zlib
+from bisect import bisect_left
+from datetime import timedelta
+from heapq import merge
+from multiprocessing import Pool
+
+from observation import Observation
+from observation_reader import compression, map_rows, parse_blocks
+from observation_timeline import (DataError, ObservationTimeline,
+                                  count_windows)
+
+# What every gzip member starts with: the magic bytes, then deflate,
+# the only compression method gzip has
+_GZIP_MEMBER = b'\x1f\x8b\x08'
+
+# The locations a find_rendezvous process looks for rendezvous at
+_locations = None
+
+
+def chunk_ranges(filename, chunks):
+    """Splits a file into byte ranges that start and end between lines
+
+    :param str filename: The name of the file to split
+
+    :param int chunks: How many ranges to aim for
+
+    :return: A list of (start, end) byte offsets, in file order
+
+    :rtype: list
+    """
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        for i in range(1, chunks):
+            # Move on to the start of the next line
+            f.seek(max(size * i // chunks - 1, bounds[-1]))
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:])
+            if start < end]
+
+
+def member_ranges(filename, chunks):
+    """Splits a gzip file into byte ranges that start and end between
+    members
+
+    A gzip file can be several compressed members one after another,
+    as cat'ing gzip files together or pigz makes. Members are not
+    indexed, so this looks for the bytes each one starts with. These
+    can also turn up by chance inside a member, which _load_members
+    finds out when it decompresses the range.
+
+    :param str filename: The name of the gzip file to split
+
+    :param int chunks: How many ranges to aim for
+
+    :return: A list of (start, end) byte offsets, in file order
+
+    :rtype: list
+    """
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for i in range(1, chunks):
+                start = data.find(_GZIP_MEMBER,
+                                  max(size * i // chunks, bounds[-1] + 1))
+                if start == -1:
+                    break
+                bounds.append(start)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def load_observations(filename, jobs):
+    """Loads an observations CSV file using a pool of processes
+
+    Each process parses one chunk of the file and sorts it by time.
+    The sorted chunks are then merged back together.
+
+    A gzip file made of several members is split between members, and
+    each process decompresses its own. Other compressed files can only
+    be read from the start, so they are loaded by this process alone.
+
+    :param str filename: The name of the observations CSV file to read
+
+    :param int jobs: How many processes to use
+
+    :returns: A tuple with the following items:
+
+                - A dictionary that maps a suspect's name to the
+                  item they are currently carrying.
+
+                - An iterator over the observations in the CSV file,
+                  in time order. Observations made at the same time
+                  stay in file order.
+
+    :rtype: tuple
+
+    :raises ValueError: If a row cannot be loaded. The message says
+        which line of the file it was on.
+
+    :raises OSError: If there is an issue finding or opening the file
+    """
+    kind = compression(filename)
+    if kind is None:
+        tasks = [(filename, start, end, i) for i, (start, end)
+                 in enumerate(chunk_ranges(filename, jobs))]
+        with Pool(jobs) as pool:
+            chunks = pool.map(_load_chunk, tasks)
+    else:
+        chunks = None
+        ranges = member_ranges(filename, jobs) if kind == 'gzip' else []
+        if len(ranges) > 1:
+            # Odd chunk numbers, so the lines that run between chunks
+            # can go in between
+            tasks = [(filename, start, end, 2 * i + 1) for i, (start, end)
+                     in enumerate(ranges)]
+            with Pool(jobs) as pool:
+                members = pool.map(_load_members, tasks)
+            if None not in members:
+                chunks = _join_members(members)
+        if chunks is None:
+            # A single member, or a range that split one after all
+            chunks = [_load_chunk((filename, 0, None, 0))]
+
+    carrying = {}
+    line = 0
+    for observations, chunk_carrying, lines, error in chunks:
+        # Report the first bad row in the file, like a single process would
+        if error is not None:
+            raise ValueError(error + " on line " + str(line + lines))
+        carrying.update(chunk_carrying)
+        line += lines
+
+    observations = (Observation.from_epoch(name, location, key)
+                    for key, _, _, name, location
+                    in merge(*[chunk[0] for chunk in chunks]))
+    return (carrying, observations)
+
+
+def find_rendezvous(timeline, jobs, window_size=timedelta(0, 3600),
+                    start=None, end=None, counts=None):
+    """Finds the rendezvous in an ObservationTimeline using a pool of
+    processes
+
+    Only observations at the same location can meet, so the locations
+    are dealt out between the processes in turn, and each looks for the
+    rendezvous at its own. The processes are given the timeline's
+    location index when they start, which forking shares without
+    copying, so nothing is built up for them here. Only the windows
+    with a rendezvous come back, and are merged back into time order.
+
+    :param ObservationTimeline timeline: The observations to look at
+
+    :param int jobs: How many processes to use
+
+    :param timedelta window_size: timeframe of observations
+
+    :param datetime start: Only look at windows starting at or after
+        this time, if given
+
+    :param datetime end: Only look at windows starting before this
+        time, if given
+
+    :param dict counts: Where to count the windows the processes
+        looked at, if desired. See count_windows().
+
+    :yield: The same (first observation, second observation) tuples as
+        timeline.rendezvous(), in the same order
+
+    :rtype: tuple
+
+    :raises DataError: If too many observations happen in timeframe.
+        It is raised at the same point as timeline.rendezvous() would.
+    """
+    seconds = window_size.total_seconds()
+    # Only the part of each location the windows in range can see
+    locations = timeline.location_entries(window_size, start, end)
+    tasks = [(shard, jobs, seconds) for shard in range(jobs)]
+    with Pool(jobs, _share_locations, (locations,)) as pool:
+        results = pool.map(_shard_rendezvous, tasks)
+    found = []
+    for shard_found, shard_counts in results:
+        found.append(shard_found)
+        count_windows(counts, shard_counts['windows generated'],
+                      shard_counts['pairwise comparisons'])
+
+    for key, added, index, crowded in merge(*found):
+        # If 3 agents are at the same place at the same time, raise Error
+        if crowded:
+            raise DataError("Can only have one rendezvous in a window")
+        # The rendezvous is the window's first two observations
+        entries = locations[index][0]
+        first = bisect_left(entries, (key, added))
+        yield (entries[first][2], entries[first + 1][2])
+
+
+def _share_locations(locations):
+    """Keeps the locations find_rendezvous is looking at, for the
+    process's _shard_rendezvous tasks
+
+    :param list locations: What location_entries() gave
+
+    :return: None
+    """
+    global _locations
+    _locations = locations
+
+
+def _shard_rendezvous(task):
+    """Finds the rendezvous at some of the locations
+
+    :param tuple task: The shard's number, how many shards there are,
+        and the timeframe of observations in seconds. The shard is
+        every location whose index leaves the shard's number when
+        divided by how many there are.
+
+    :return: A list of (time key, order added, location index, crowded)
+        tuples in time order, one for each window with a rendezvous or
+        too many observations in it. Then the counts of the windows
+        looked at, as count_windows() keeps them.
+
+    :rtype: tuple
+    """
+    shard, shards, seconds = task
+    found = []
+    counts = {'windows generated': 0, 'pairwise comparisons': 0}
+    for index in range(shard, len(_locations), shards):
+        entries, windows = _locations[index]
+        for (key, added), rend in ObservationTimeline._location_rendezvous(
+                entries, seconds, windows, counts):
+            found.append((key, added, index, rend is None))
+    found.sort()
+    return found, counts
+
+
+def _load_chunk(task):
+    """Parses and sorts one chunk of an observations CSV file
+
+    :param tuple task: The file name, start and end byte offsets, and
+        the chunk's position in the file
+
+    :returns: A tuple with the following items:
+
+                - A list of (time key, chunk, row, name, location)
+                  tuples in time order.
+
+                - A dictionary of the items carried in the chunk.
+
+                - The number of lines read.
+
+                - None, or the error message for the bad row. The bad
+                  row is the last line read.
+
+    :rtype: tuple
+    """
+    filename, start, end, chunk = task
+    return _sort_rows(map_rows(filename, start, end), chunk)
+
+
+def _load_members(task):
+    """Decompresses, parses and sorts the gzip members in one chunk of
+    a file
+
+    Lines can run from one member into the next, so the part before
+    the chunk's first newline and after its last are given back as
+    they are, for _join_members.
+
+    :param tuple task: The file name, start and end byte offsets, and
+        the chunk's position in the file
+
+    :returns: None if the range turned out not to be whole members.
+        Otherwise, a tuple of the same items as _load_chunk, followed
+        by:
+
+                - The text before the first newline, or the whole
+                  text if it has none.
+
+                - The text after the last newline, or None if it has
+                  none.
+
+    :rtype: tuple
+    """
+    filename, start, end, chunk = task
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    try:
+        data = gzip.decompress(data)
+    except (EOFError, OSError, zlib.error):
+        # It started or stopped part way through a member
+        return None
+    text = data.decode(locale.getpreferredencoding(False))
+    del data
+
+    first = text.find('\n')
+    if first == -1:
+        return [], {}, 0, None, text, None
+    last = text.rfind('\n')
+    rows = parse_blocks([text[first + 1:last]]) if first < last else ()
+    return _sort_rows(rows, chunk) + (text[:first], text[last + 1:])
+
+
+def _join_members(members):
+    """Puts the lines that run between member chunks back together
+
+    :param list members: What _load_members gave for each chunk, in
+        file order
+
+    :return: A list of the same tuples as _load_chunk gives, in file
+        order. The joined lines have the even chunk numbers, between
+        the chunks on either side of them.
+
+    :rtype: list
+    """
+    chunks = []
+    # The start of a line that has not ended yet
+    pending = ''
+    for i, (observations, carrying, lines, error, head, tail) in enumerate(
+            members):
+        if tail is None:
+            pending += head
+            continue
+        chunks.append(_sort_rows(parse_blocks([pending + head]), 2 * i))
+        chunks.append((observations, carrying, lines, error))
+        pending = tail
+    if pending:
+        chunks.append(_sort_rows(parse_blocks([pending]), 2 * len(members)))
+    return chunks
+
+
+def _sort_rows(rows, chunk):
+    """Sorts the parsed rows of one chunk of an observations CSV file
+
+    :param iterable rows: (name, location, time key, item) tuples
+
+    :param int chunk: The chunk's position in the file
+
+    :returns: The same tuple as _load_chunk
+
+    :rtype: tuple
+    """
+    observations = []
+    carrying = {}
+    lines = 0
+    try:
+        for name, location, key, item in rows:
+            lines += 1
+            observations.append((key, chunk, lines, name, location))
+            if not item == '':
+                carrying[name] = item
+    except ValueError as e:
+        # The bad row is the one after the last good one
+        return None, None, lines + 1, str(e)
+    observations.sort()
+    return observations, carrying, lines, None
@@ -0,0 +1,181 @@
+import json
+import resource
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class Profile:
+    def __init__(self, enabled=True):
+        """Constructor for a Profile
+
+        Adds up the wall time spent in each stage of a run, along with
+        how much memory the process had used by the end of it, and
+        keeps counters of how much work was done.
+
+        Time spent in a stage while inside another one only counts
+        towards the inner stage.
+
+        :param bool enabled: If False, nothing is measured and stages
+            cost next to nothing
+
+        :return: None
+        """
+        self.enabled = enabled
+        # Maps each stage's name to its seconds and peak memory, in the
+        # order the stages were first entered
+        self.stages = {}
+        self.counters = {}
+        # Seconds counted so far by stages, to take out of outer stages
+        self._counted = 0.0
+        self._started = perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Measures a stage of the run
+
+        :param str name: The name of the stage
+
+        :return: A context manager to run the stage in
+        """
+        if not self.enabled:
+            yield
+            return
+        self._stage(name)
+        before = perf_counter()
+        counted = self._counted
+        try:
+            yield
+        finally:
+            self._add(name, before, counted)
+
+    def iterate(self, name, iterable, counter=None):
+        """Measures the time spent getting each value of an iterable
+
+        For stages that run bit by bit, like a generator, in between
+        other work.
+
+        :param str name: The name of the stage
+
+        :param iterable iterable: What to measure
+
+        :param str counter: A counter to add the number of values to,
+            if desired
+
+        :return: An iterator over the same values
+        """
+        if not self.enabled:
+            return iter(iterable)
+        self._stage(name)
+        return self._iterate(name, iter(iterable), counter)
+
+    def count(self, name, amount=1):
+        """Adds to a counter
+
+        :param str name: The name of the counter
+
+        :param int amount: How much to add
+
+        :return: None
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        """Everything measured so far
+
+        :return: A dictionary with the total seconds, each stage's
+            seconds and peak memory in bytes, and the counters
+
+        :rtype: dict
+        """
+        return {
+            'seconds': perf_counter() - self._started,
+            'peak_memory': _peak_memory(),
+            'stages': [dict(name=name, **stage)
+                       for name, stage in self.stages.items()],
+            'counters': dict(self.counters),
+        }
+
+    def write(self, filename):
+        """Writes the report out as JSON
+
+        :param str filename: The file to write to, or '-' for stderr
+
+        :return: None
+
+        :raises OSError: If the file cannot be written
+        """
+        text = json.dumps(self.report(), indent=2) + '\n'
+        if filename == '-':
+            sys.stderr.write(text)
+        else:
+            with open(filename, 'w') as f:
+                f.write(text)
+
+    def _iterate(self, name, iterator, counter):
+        """Does the work for iterate()
+
+        :yield: The values of the iterator
+        """
+        values = 0
+        try:
+            while True:
+                before = perf_counter()
+                counted = self._counted
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    self._add(name, before, counted)
+                    return
+                except BaseException:
+                    self._add(name, before, counted)
+                    raise
+                self._add(name, before, counted)
+                values += 1
+                yield value
+        finally:
+            if counter is not None:
+                self.count(counter, values)
+
+    def _add(self, name, before, counted):
+        """Counts time towards a stage
+
+        :param str name: The name of the stage
+
+        :param float before: When the stage started, from perf_counter
+
+        :param float counted: What _counted was when the stage started
+
+        :return: None
+        """
+        elapsed = perf_counter() - before
+        stage = self._stage(name)
+        # Leave out any time inner stages already counted
+        stage['seconds'] += elapsed - (self._counted - counted)
+        stage['peak_memory'] = max(stage['peak_memory'], _peak_memory())
+        self._counted = counted + elapsed
+
+    def _stage(self, name):
+        """Looks up a stage's measurements, starting them if it's new
+
+        :param str name: The name of the stage
+
+        :return: The stage's seconds and peak memory
+
+        :rtype: dict
+        """
+        return self.stages.setdefault(name, {'seconds': 0.0,
+                                             'peak_memory': 0})
+
+
+def _peak_memory():
+    """The most memory the process has used so far
+
+    :return: The peak resident set size, in bytes
+
+    :rtype: int
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux counts in kilobytes, macOS in bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -0,0 +1,382 @@
+import os
+import sqlite3
+import tempfile
+from collections import deque
+from datetime import timedelta
+from itertools import islice
+
+from observation import Observation, time_key
+from observation_stream import stream_rendezvous
+
+# How many observations to insert with each executemany
+_BATCH_SIZE = 10000
+
+# Ties are broken by id, which counts up in the order rows are added.
+# The name index is unique, so it also keeps out repeats of the same
+# observation. The location index is for looking up who was at a place
+# straight from SQL, such as in the sqlite3 shell. rendezvous() scans
+# the time index instead, so that it can stream them out in time order.
+# The carried items are kept in the order each suspect was first given
+# one, as a dictionary keeps them.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    location TEXT NOT NULL,
+    time INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS observations_time ON observations (time);
+CREATE INDEX IF NOT EXISTS observations_location
+    ON observations (location, time);
+CREATE UNIQUE INDEX IF NOT EXISTS observations_name
+    ON observations (name, time, location);
+CREATE TABLE IF NOT EXISTS carrying (
+    name TEXT PRIMARY KEY,
+    item TEXT NOT NULL
+);
+"""
+
+
+class SqliteTimeline:
+    def __init__(self, filename=None):
+        """Constructor for a SqliteTimeline
+
+        Works like an ObservationTimeline, but keeps the observations
+        in a SQLite database on disk instead of in memory. Queries are
+        range scans of its indexes, read through a cursor as they are
+        needed.
+
+        Unlike the other timelines, repeats of an observation that is
+        already in the timeline are left out.
+
+        :param str filename: The database file. Observations already
+            in it are part of the timeline. Defaults to a temporary
+            file that is removed by close().
+
+        :return: None
+        """
+        # How many repeated observations have been left out
+        self.dropped = 0
+        self._directory = None
+        if filename is None:
+            self._directory = tempfile.TemporaryDirectory()
+            filename = os.path.join(self._directory.name, 'timeline.db')
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        if self._directory is not None:
+            # Nothing to keep safe if the process dies
+            self._connection.execute('PRAGMA synchronous = OFF')
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+        # Counting the rows in SQL means a full scan, so keep count here
+        self._count = self._connection.execute(
+            'SELECT COUNT(*) FROM observations').fetchone()[0]
+
+    @classmethod
+    def from_iterable(cls, observations):
+        """Builds a SqliteTimeline from many observations at once
+
+        :param iterable observations: Observations in any order
+
+        :return: A new timeline, in a temporary file, holding the
+            observations
+
+        :rtype: SqliteTimeline
+        """
+        timeline = cls()
+        timeline.add_many(observations)
+        return timeline
+
+    def __len__(self):
+        """How many observations are in the timeline
+
+        :rtype: int
+        """
+        return self._count
+
+    def __iter__(self):
+        """Reads every observation, in time order
+
+        :rtype: iterator
+        """
+        return self._select([], ())
+
+    @property
+    def observations(self):
+        """A list of every observation, in time order
+
+        :rtype: list
+        """
+        return list(self)
+
+    @property
+    def carrying(self):
+        """Maps each suspect's name to the item add_carrying() last
+        recorded for them
+
+        :rtype: dict
+        """
+        return dict(self._connection.execute(
+            'SELECT name, item FROM carrying ORDER BY rowid'))
+
+    def add_carrying(self, carrying):
+        """Records who is carrying what alongside the observations
+
+        Items replace the ones recorded before, like updating a
+        dictionary, so that a database that is opened again knows what
+        everyone in it was carrying.
+
+        :param dict carrying: Maps the name of each suspect to the item
+            they are carrying
+
+        :return: None
+        """
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO carrying (name, item) VALUES (?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET item = excluded.item',
+                carrying.items())
+
+    def close(self):
+        """Closes the database, removing it if it was temporary
+
+        :return: None
+        """
+        self._connection.close()
+        if self._directory is not None:
+            self._directory.cleanup()
+
+    def add(self, observation):
+        """Adds an Observation to the timeline
+
+        Observations made at the same time stay in the order
+        they were added.
+
+        :param Observation observation: A single observation
+
+        :return: None
+        """
+        self.add_many([observation])
+
+    def add_many(self, observations):
+        """Adds a batch of Observations to the timeline
+
+        The rows are inserted a large batch at a time, all in one
+        transaction, and the indexes keep them in order. Any that are
+        already in the timeline are counted in dropped instead.
+
+        :param iterable observations: Observations in any order
+
+        :return: None
+        """
+        rows = ((o.name, o.location, o.key) for o in observations)
+        before = self._connection.total_changes
+        given = 0
+        with self._connection:
+            while True:
+                batch = list(islice(rows, _BATCH_SIZE))
+                if not batch:
+                    break
+                self._connection.executemany(
+                    'INSERT OR IGNORE INTO observations (name, location, '
+                    'time) VALUES (?, ?, ?)', batch)
+                given += len(batch)
+        added = self._connection.total_changes - before
+        self._count += added
+        self.dropped += given - added
+
+    def between(self, start, end):
+        """The observations made from one time up to another
+
+        :param datetime start: The earliest time to include
+
+        :param datetime end: The time to stop at. Observations made at
+            this time are left out.
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return list(self._select(*self._time_range(start, end)))
+
+    def before(self, time):
+        """The observations made before a time
+
+        :param datetime time: The time to stop at, which is left out
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return list(self._select(*self._time_range(None, time)))
+
+    def after(self, time):
+        """The observations made at or after a time
+
+        Together with before(time), this covers every observation.
+
+        :param datetime time: The earliest time to include
+
+        :return: The observations, in time order
+
+        :rtype: list
+        """
+        return list(self._select(*self._time_range(time, None)))
+
+    def trajectory(self, name, start=None, end=None):
+        """Where a suspect was seen, from one time up to another
+
+        Found by a range scan of the name index.
+
+        :param str name: The suspect's name
+
+        :param datetime start: The earliest time to include, if given
+
+        :param datetime end: The time to stop at, if given. Observations
+            made at this time are left out.
+
+        :return: The suspect's observations, in time order
+
+        :rtype: list
+        """
+        conditions, parameters = self._time_range(start, end)
+        return list(self._select(['name = ?'] + conditions,
+                                 (name,) + parameters))
+
+    def window_ranges(self, window_size=timedelta(0, 3600),
+                      skip_singletons=False):
+        """Yields the index range of every window in the timeline
+
+        Only the time keys of the windows still open are held at once.
+
+        :param timedelta window_size: timeframe
+
+        :param bool skip_singletons: Skip windows with only one observation
+
+        :yield: A (start, end) tuple of positions in the timeline
+
+        :rtype: tuple
+        """
+        seconds = window_size.total_seconds()
+        # Position and time key of each window that is still open
+        open_windows = deque()
+        end = 0
+        for (key,) in self._connection.execute(
+                'SELECT time FROM observations ORDER BY time, id'):
+            while open_windows and open_windows[0][1] + seconds <= key:
+                start = open_windows.popleft()[0]
+                if not (skip_singletons and end - start == 1):
+                    yield start, end
+            open_windows.append((end, key))
+            end += 1
+        for start, _ in open_windows:
+            if not (skip_singletons and end - start == 1):
+                yield start, end
+
+    def windows(self, window_size=timedelta(0, 3600), skip_singletons=False):
+        """Yields all observations that happen within
+        a specified timeframe from the first observation
+
+        Only the observations of the windows still open are held at
+        once.
+
+        :param timedelta window_size: timeframe
+
+        :param bool skip_singletons: Skip windows with only one observation
+
+        :yield: A tuple of the observations in timeframe
+        from first observation
+
+        :rtype: tuple
+        """
+        seconds = window_size.total_seconds()
+        # Everything from the first open window's observation on, which
+        # is exactly what that window holds
+        pending = deque()
+        for observation in self:
+            while pending and pending[0].key + seconds <= observation.key:
+                if not (skip_singletons and len(pending) == 1):
+                    yield tuple(pending)
+                pending.popleft()
+            pending.append(observation)
+        while pending:
+            if not (skip_singletons and len(pending) == 1):
+                yield tuple(pending)
+            pending.popleft()
+
+    def rendezvous(self, window_size=timedelta(0, 3600), start=None,
+                   end=None, counts=None):
+        """Sees if two agents rendeviwed or not
+
+        Reads the windows in the time range through a range scan of
+        the time index, only holding the windows still open at once.
+
+        :param timedelta window_size: timeframe of observations
+
+        :param datetime start: Only look at windows starting at or
+            after this time, if given
+
+        :param datetime end: Only look at windows starting before this
+            time, if given
+
+        :param dict counts: Where to count the windows looked at, if
+            desired. See count_windows().
+
+        :returns: A tuple with the following items:
+
+                - First observation
+
+                - Second observation
+
+        :rtype: tuple
+
+        :raises DataError: If too many observations happen in timeframe
+
+        """
+        # Windows in the range can reach past end
+        observations = self._select(*self._time_range(
+            start, None if end is None else end + window_size))
+        yield from stream_rendezvous(observations, window_size, start, end,
+                                     counts)
+
+    def _select(self, conditions, parameters):
+        """Reads observations through a cursor, in time order
+
+        :param list conditions: SQL conditions the rows must all meet
+
+        :param tuple parameters: The values for the conditions
+
+        :yield: Each observation
+
+        :rtype: Observation
+        """
+        where = ''
+        if conditions:
+            where = 'WHERE ' + ' AND '.join(conditions) + ' '
+        for name, location, key in self._connection.execute(
+                'SELECT name, location, time FROM observations ' + where +
+                'ORDER BY time, id', parameters):
+            yield Observation.from_epoch(name, location, key)
+
+    @staticmethod
+    def _time_range(start, end):
+        """Builds the conditions for a time range
+
+        :param datetime start: The earliest time to include, or None
+
+        :param datetime end: The time to stop at, or None
+
+        :return: A list of SQL conditions, and a tuple of the values
+            for them
+
+        :rtype: tuple
+        """
+        conditions = []
+        parameters = ()
+        if start is not None:
+            conditions.append('time >= ?')
+            parameters += (time_key(start),)
+        if end is not None:
+            conditions.append('time < ?')
+            parameters += (time_key(end),)
+        return conditions, parameters
@@ -0,0 +1,169 @@
+"""Tests for columnar_timeline module
+"""
+import pytest
+
+from datetime import datetime, timedelta
+
+from columnar_timeline import ColumnarTimeline
+from observation import Observation
+from observation_timeline import DataError, ObservationTimeline
+from test_observation_stream import (calm_observations, random_observations,
+                                     rendezvous_or_error)
+
+
+def as_tuples(observations):
+    """A helper function that turns Observations into comparable tuples
+
+    :param iterable observations: Observations
+
+    :return: a list of (name, location, time) tuples
+    """
+    return [(o.name, o.location, o.time) for o in observations]
+
+
+def test_add():
+    """Test that the columns end up in the same order as a timeline."""
+    observations = random_observations()
+
+    columnar = ColumnarTimeline.from_iterable(observations[:100])
+    timeline = ObservationTimeline.from_iterable(observations[:100])
+    for o in observations[100:150]:
+        columnar.add(o)
+        timeline.add(o)
+    columnar.add_many(observations[150:])
+    timeline.add_many(observations[150:])
+
+    assert len(columnar) == len(observations)
+    assert (as_tuples(columnar.observations) ==
+            as_tuples(timeline.observations))
+    # Names and locations are only stored once each
+    assert len(columnar.location_table) <= 10
+
+
+def test_add_many_batches():
+    """Test that batches merged in keep the columns and the suspect
+    index in the same order as a timeline."""
+    observations = random_observations()
+    for i, o in enumerate(observations):
+        o.name = str(i % 7)
+    columnar = ColumnarTimeline()
+    timeline = ObservationTimeline()
+    for start in range(0, len(observations), 40):
+        columnar.add_many(observations[start:start + 40])
+        timeline.add_many(observations[start:start + 40])
+        assert (as_tuples(columnar.observations) ==
+                as_tuples(timeline.observations))
+        # Built after the first batch, and merged into after that
+        for name in "0123456":
+            assert (as_tuples(columnar.trajectory(name)) ==
+                    as_tuples(timeline.trajectory(name)))
+
+
+def test_windows():
+    """Test that windows match the ones from a timeline."""
+    observations = random_observations()
+    columnar = ColumnarTimeline.from_iterable(observations)
+    timeline = ObservationTimeline.from_iterable(observations)
+
+    for size in (timedelta(minutes=1), timedelta(hours=1)):
+        assert (list(columnar.window_ranges(size)) ==
+                list(timeline.window_ranges(size)))
+        assert ([as_tuples(w) for w in columnar.windows(size, True)] ==
+                [as_tuples(w) for w in timeline.windows(size, True)])
+
+
+def test_rendezvous():
+    """Test that rendezvous match the ones from a timeline."""
+    for _ in range(20):
+        observations = random_observations()
+        columnar = ColumnarTimeline.from_iterable(observations)
+        timeline = ObservationTimeline.from_iterable(observations)
+
+        found = rendezvous_or_error(columnar.rendezvous())
+        expected = rendezvous_or_error(timeline.rendezvous())
+        assert ([r if r is DataError else as_tuples(r) for r in found] ==
+                [r if r is DataError else as_tuples(r) for r in expected])
+
+
+def test_rendezvous_data_error():
+    """Test that a crowded window raises a DataError when reached."""
+    timeline = ColumnarTimeline()
+    timeline.add(Observation("Skeletor", "Starbucks", "1970-01-02 02:53:00"))
+    timeline.add(Observation("Doc Oc", "Starbucks", "1970-01-02 03:05:00"))
+    timeline.add(Observation("Joker", "Arby's", "1970-01-02 05:00:00"))
+    timeline.add(Observation("Bane", "Arby's", "1970-01-02 05:10:00"))
+    timeline.add(Observation("Riddler", "Arby's", "1970-01-02 05:20:00"))
+
+    rendezvous = timeline.rendezvous()
+    assert next(rendezvous)[0].name == "Skeletor"
+    with pytest.raises(DataError):
+        next(rendezvous)
+
+
+def test_between():
+    """Test that time range queries match the ones from a timeline."""
+    observations = random_observations()
+    columnar = ColumnarTimeline.from_iterable(observations)
+    timeline = ObservationTimeline.from_iterable(observations)
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    assert (as_tuples(columnar.between(start, end)) ==
+            as_tuples(timeline.between(start, end)))
+    assert as_tuples(columnar.before(end)) == as_tuples(timeline.before(end))
+    assert as_tuples(columnar.after(end)) == as_tuples(timeline.after(end))
+
+
+def test_trajectory():
+    """Test that trajectories match a timeline's, as observations are
+    added."""
+    observations = [Observation(str(i % 7), o.location, str(o.time))
+                    for i, o in enumerate(random_observations())]
+    columnar = ColumnarTimeline.from_iterable(observations[:150])
+    timeline = ObservationTimeline.from_iterable(observations[:150])
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for name in "0123456":
+        assert (as_tuples(columnar.trajectory(name, start, end)) ==
+                as_tuples(timeline.trajectory(name, start, end)))
+    for o in observations[150:]:
+        columnar.add(o)
+        timeline.add(o)
+    for name in "01234567":
+        assert (as_tuples(columnar.trajectory(name)) ==
+                as_tuples(timeline.trajectory(name)))
+
+
+def test_rendezvous_range():
+    """Test that rendezvous in a time range match a timeline's."""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(20):
+        observations = random_observations()
+        columnar = ColumnarTimeline.from_iterable(observations)
+        timeline = ObservationTimeline.from_iterable(observations)
+        for bounds in ((start, None), (None, end), (start, end)):
+            found = rendezvous_or_error(columnar.rendezvous(
+                timedelta(0, 3600), *bounds))
+            expected = rendezvous_or_error(timeline.rendezvous(
+                timedelta(0, 3600), *bounds))
+            assert ([r if r is DataError else as_tuples(r) for r in found] ==
+                    [r if r is DataError else as_tuples(r)
+                     for r in expected])
+
+
+def test_rendezvous_counts():
+    """Test that the windows looked at are counted like a timeline's."""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(5):
+        observations = calm_observations()
+        columnar = ColumnarTimeline.from_iterable(observations)
+        timeline = ObservationTimeline.from_iterable(observations)
+        for bounds in ((None, None), (start, end)):
+            counts = {}
+            expected = {}
+            list(columnar.rendezvous(timedelta(0, 3600), *bounds,
+                                     counts=counts))
+            list(timeline.rendezvous(timedelta(0, 3600), *bounds,
+                                     counts=expected))
+            assert counts == expected
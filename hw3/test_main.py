@@ -1,8 +1,12 @@
 """Tests for main module
 """
+from columnar_timeline import ColumnarTimeline
 from observation_timeline import ObservationTimeline
 from observation import Observation
-from main import load_timeline
+from observation_stream import DuplicateFilter
+from sqlite_timeline import SqliteTimeline
+from main import (expand_globs, load_timeline, merge_timelines,
+                  stream_timeline, stream_timelines)
 
 
 def test_load_timeline():
@@ -31,3 +35,103 @@ def test_load_timeline():
                 time_tuple[1].observations[x].location)
         assert (timeline.observations[x].time ==
                 time_tuple[1].observations[x].time)
+
+
+def test_stream_timeline(tmpdir):
+    """Tests that stream_timeline matches load_timeline"""
+    csv = tmpdir.join('observations.csv')
+    csv.write("Jane,Starbucks,1970-01-02 03:53:00,Mits\n"
+              "Bob,Starbucks,1970-01-02 02:53:00,shoes\n"
+              "Aaron,My house,1970-01-02 05:53:00,\n"
+              "Bob,My house,1970-01-02 05:53:00,socks\n")
+
+    carrying, timeline = load_timeline(str(csv))
+    stream_carrying, observations = stream_timeline(str(csv), run_size=2)
+
+    assert stream_carrying == carrying == {"Bob": "socks", "Jane": "Mits"}
+    assert ([(o.name, o.location, o.time) for o in observations] ==
+            [(o.name, o.location, o.time) for o in timeline.observations])
+
+
+def test_load_timeline_columnar(tmpdir):
+    """Tests that load_timeline can load straight into a ColumnarTimeline"""
+    csv = tmpdir.join('observations.csv')
+    csv.write("Jane,Starbucks,1970-01-02 03:53:00,Mits\n"
+              "Bob,Starbucks,1970-01-02 02:53:00,shoes\n")
+
+    carrying, timeline = load_timeline(str(csv), ColumnarTimeline())
+
+    assert carrying == {"Bob": "shoes", "Jane": "Mits"}
+    assert isinstance(timeline, ColumnarTimeline)
+    assert [o.name for o in timeline.observations] == ["Bob", "Jane"]
+
+
+def test_merge_timelines(tmpdir):
+    """Tests that several files load like the files joined together"""
+    parts = ["Jane,Starbucks,1970-01-02 03:53:00,Mits\n"
+             "Bob,Starbucks,1970-01-02 02:53:00,shoes\n",
+             "Aaron,My house,1970-01-02 02:53:00,\n"
+             "Bob,My house,1970-01-02 05:53:00,socks\n",
+             "Mike,Starbucks,1970-01-02 02:53:00,hat\n"]
+    filenames = []
+    for i, part in enumerate(parts):
+        csv = tmpdir.join('part{}.csv'.format(i))
+        csv.write(part)
+        filenames.append(str(csv))
+    joined = tmpdir.join('joined.csv')
+    joined.write("".join(parts))
+    carrying, timeline = load_timeline(str(joined))
+    expected = [(o.name, o.location, o.time) for o in timeline.observations]
+
+    for backend in (ObservationTimeline, ColumnarTimeline, SqliteTimeline):
+        merged_carrying, merged = merge_timelines(filenames, backend(),
+                                                  cache=False)
+        assert merged_carrying == carrying
+        assert isinstance(merged, backend)
+        assert [(o.name, o.location, o.time)
+                for o in merged.observations] == expected
+        if backend is SqliteTimeline:
+            merged.close()
+
+    stream_carrying, observations = stream_timelines(filenames, run_size=1)
+    assert list(stream_carrying.items()) == list(carrying.items())
+    assert [(o.name, o.location, o.time) for o in observations] == expected
+
+
+def test_duplicates(tmpdir):
+    """Tests that repeated observations are dropped within and across
+    files"""
+    filenames = []
+    for i, part in enumerate(["Bob,Starbucks,1970-01-02 02:53:00,shoes\n"
+                              "Jane,Starbucks,1970-01-02 02:54:00,Mits\n"
+                              "Bob,Starbucks,1970-01-02 02:53:00,\n",
+                              "Jane,Starbucks,1970-01-02 02:54:00,\n"]):
+        csv = tmpdir.join('part{}.csv'.format(i))
+        csv.write(part)
+        filenames.append(str(csv))
+
+    duplicates = DuplicateFilter()
+    _, timeline = load_timeline(filenames[0], duplicates=duplicates)
+    assert len(timeline) == 2
+    assert duplicates.dropped == 1
+
+    duplicates = DuplicateFilter()
+    _, merged = merge_timelines(filenames, cache=False,
+                                duplicates=duplicates)
+    assert merged.observations == timeline.observations
+    assert duplicates.dropped == 2
+
+    duplicates = DuplicateFilter()
+    _, observations = stream_timelines(filenames, duplicates=duplicates)
+    assert list(observations) == timeline.observations
+    assert duplicates.dropped == 2
+
+
+def test_expand_globs(tmpdir):
+    """Tests that wildcards are filled in, and other names kept"""
+    for name in ('b.csv', 'a.csv', 'c.txt'):
+        tmpdir.join(name).write("")
+    pattern = str(tmpdir.join('*.csv'))
+    missing = str(tmpdir.join('missing*.csv'))
+    assert expand_globs([pattern, missing]) == [
+        str(tmpdir.join('a.csv')), str(tmpdir.join('b.csv')), missing]
@@ -6,7 +6,7 @@ Feel free to add more tests as you see fit.
 import datetime
 import pytest
 
-from observation import Observation
+from observation import Observation, parse_time
 
 
 def test_lt():
@@ -45,6 +45,21 @@ def test_ge():
     assert o2 >= o1
 
 
+def test_eq():
+    """Test == operator and hashing"""
+    o1 = Observation("Scratch", "Starbucks", "2016-01-11 12:00:00")
+    o2 = Observation("Scratch", "Starbucks", "2016-01-11 12:00:00")
+    assert o1 == o2
+    assert hash(o1) == hash(o2)
+    assert len({o1, o2}) == 1
+    # The same time isn't enough
+    assert not o1 == Observation("Grounder", "Starbucks",
+                                 "2016-01-11 12:00:00")
+    assert o1 != Observation("Scratch", "Home", "2016-01-11 12:00:00")
+    assert o1 != Observation("Scratch", "Starbucks", "2016-01-11 12:00:01")
+    assert not o1 == "Scratch"
+
+
 def test_datetime():
     """Test loading the :class:`datetime.datetime` from a string"""
     # Check the type
@@ -76,3 +91,50 @@ def test_str():
     """Test str construction"""
     o = Observation("Dr. Robotnik", "Starbucks", "2016-01-11 12:04:02")
     assert str(o) == "Dr. Robotnik at Starbucks (2016-01-11 12:04:02)"
+
+
+def test_compact():
+    """Test the compact representation"""
+    o = Observation("Dr. Robotnik", "Starbucks", "1970-01-02 00:00:02")
+    # No per-instance dictionary
+    assert not hasattr(o, '__dict__')
+    # Seconds since the epoch
+    assert o.key == 86402
+    assert o.timeString == "1970-01-02 00:00:02"
+
+    # Names and locations are shared between observations
+    o2 = Observation("".join(["Dr. ", "Robotnik"]), "Starbucks",
+                     "1970-01-02 00:00:03")
+    assert o2.name is o.name
+
+
+def test_from_epoch():
+    """Test building an Observation from a time key"""
+    o = Observation("Scratch", "Starbucks", "2016-01-11 12:04:02")
+    copy = Observation.from_epoch("Scratch", "Starbucks", o.key)
+    assert copy.time == o.time
+    assert str(copy) == str(o)
+
+
+def test_parse_time():
+    """Test that parse_time agrees with datetime.strptime"""
+    good = ["2016-01-11 12:04:02", "1970-01-01 00:00:00",
+            "1969-12-31 23:59:59", "2016-02-29 08:30:00",
+            "2016-1-5 1:2:3", "0001-01-01 00:00:00"]
+    for time in good:
+        parsed = datetime.datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+        assert (datetime.datetime(1970, 1, 1) +
+                datetime.timedelta(seconds=parse_time(time)) == parsed)
+
+    bad = ["2016-01-11 12:00:", "2016-01- 12:00:00", "2015-02-29 08:30:00",
+           "2016-13-01 00:00:00", "2016-01-01 24:00:00",
+           "2016-01-01 00:00:60", "0000-01-01 00:00:00",
+           "2016-01-01T00:00:00", "+016-01-01 00:00:00", ""]
+    for time in bad:
+        with pytest.raises(ValueError):
+            datetime.datetime.strptime(time, "%Y-%m-%d %H:%M:%S")
+        with pytest.raises(ValueError):
+            parse_time(time)
+
+    # The cache doesn't grow forever
+    assert parse_time.cache_info().maxsize is not None
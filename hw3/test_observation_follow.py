@@ -0,0 +1,93 @@
+"""Tests for observation_follow module
+"""
+import random
+
+from observation import Observation
+from observation_follow import FollowStream, follow_rendezvous, tail_lines
+from observation_timeline import ObservationTimeline
+from ownership import Ownership
+from test_observation_stream import random_observations, rendezvous_or_error
+
+
+def follow(observations):
+    """A helper function that runs observations through a FollowStream
+
+    :param list observations: Observations in the order they arrive
+
+    :return: a list of rendezvous, ending in DataError if one was raised
+    """
+    stream = FollowStream()
+
+    def rendezvous():
+        for observation in observations:
+            assert stream.add(observation)
+            yield from stream.ready()
+        stream.close()
+        yield from stream.ready()
+
+    return rendezvous_or_error(rendezvous())
+
+
+def test_follow_stream():
+    """Test that rows up to an hour late still find the same rendezvous."""
+    for _ in range(20):
+        # Each observation turns up to an hour after it was made
+        arrivals = sorted(random_observations(),
+                          key=lambda o: o.key + random.randint(0, 3599))
+        # Which is the order a file of them would be written in
+        timeline = ObservationTimeline.from_iterable(arrivals)
+        assert follow(arrivals) == rendezvous_or_error(timeline.rendezvous())
+
+
+def test_follow_stream_watermark():
+    """Test that windows are given out once they are behind the watermark,
+    and rows older than the watermark are left out."""
+    stream = FollowStream()
+    assert stream.watermark is None
+    assert stream.add(Observation("Bob", "Starbucks", "1970-01-02 02:53:00"))
+    assert stream.add(Observation("Jane", "Starbucks",
+                                  "1970-01-02 02:54:00"))
+    assert list(stream.ready()) == []
+    # Jane's row could still be beaten by a late one
+    assert stream.add(Observation("Tom", "Home", "1970-01-02 04:00:00"))
+    assert list(stream.ready()) == []
+    assert stream.add(Observation("Tom", "Home", "1970-01-02 04:54:00"))
+    assert [(first.name, second.name) for first, second in
+            stream.ready()] == [("Bob", "Jane")]
+    assert stream.watermark == Observation(
+        "Tom", "Home", "1970-01-02 03:54:00").key
+
+    assert not stream.add(Observation("Sam", "Starbucks",
+                                      "1970-01-02 02:55:00"))
+    assert stream.late == 1
+
+
+def test_tail_lines(tmpdir):
+    """Test that lines are only given once they are whole."""
+    filename = str(tmpdir.join('observations.csv'))
+    with open(filename, 'w') as f:
+        f.write("first\r\nsec")
+    writes = ["ond\nthi", "rd"]
+
+    def idle():
+        if not writes:
+            return True
+        with open(filename, 'a') as f:
+            f.write(writes.pop(0))
+
+    assert list(tail_lines(filename, 0, idle)) == ["first", "second",
+                                                   "third"]
+
+
+def test_follow_rendezvous():
+    """Test that suspects are tracked from the first row with an item."""
+    lines = ["Bob,Starbucks,1970-01-02 02:53:00,shoes",
+             "Jane,Starbucks,1970-01-02 02:54:00,Mits",
+             "Bob,Home,1970-01-02 05:00:00,",
+             "Jane,Starbucks,1970-01-02 01:00:00,"]
+    ownership = Ownership({}, history=False)
+    rendezvous = list(follow_rendezvous(lines, ownership))
+    assert [(first.name, second.name) for first, second in
+            rendezvous] == [("Bob", "Jane")]
+    assert ownership.carrying == {"Bob": "shoes", "Jane": "Mits"}
+    assert len(ownership) == 0
@@ -0,0 +1,107 @@
+"""Tests for observation_reader module
+"""
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+import observation_reader
+from observation import parse_time
+from observation_reader import compression, map_rows, read_rows
+
+
+def write_file(tmpdir, text):
+    """A helper function that writes an observations CSV file
+
+    :param tmpdir: pytest's tmpdir fixture
+
+    :param str text: The contents of the file
+
+    :return: The name of the file
+    """
+    csv = tmpdir.join('observations.csv')
+    csv.write_binary(text.encode('utf-8'))
+    return str(csv)
+
+
+def test_map_rows(tmpdir):
+    """Test that map_rows reads the same rows as read_rows"""
+    filename = write_file(tmpdir,
+                          "Bob,Starbucks,1970-01-02 02:53:00,shoes\r\n"
+                          "\"Jane\",Starbucks,1970-01-02 03:53:00,Mits\n"
+                          "Zoe,My house,1970-01-02 05:53:00,\n"
+                          "Bob,Starbucks,1970-1-2 6:53:00,")
+
+    expected = [(name, location, parse_time(time), item)
+                for name, location, time, item in read_rows(filename)]
+    rows = list(map_rows(filename))
+    assert rows == expected
+    assert rows[1][0] == "Jane"
+
+    # Repeated strings are shared
+    assert rows[0][0] is rows[3][0]
+    assert rows[0][1] is rows[1][1]
+
+
+def test_map_rows_line_endings(tmpdir, monkeypatch):
+    """Test that every line ending read_rows allows works, even when a
+    \r\n is split between blocks"""
+    monkeypatch.setattr(observation_reader, '_BLOCK_SIZE', 41)
+    for text in ("Bob,Starbucks,1970-01-02 02:53:00,shoes\r"
+                 "Jane,Starbucks,1970-01-02 03:53:00,Mits\r",
+                 "Bob,Starbucks,1970-01-02 02:53:00,shoes\r\n"
+                 "Jane,Starbucks,1970-01-02 03:53:00,Mits\r\n"
+                 "Zoe,My house,1970-01-02 05:53:00,\r"
+                 "Bob,Starbucks,1970-01-02 06:53:00,\n"):
+        filename = write_file(tmpdir, text)
+        expected = [(name, location, parse_time(time), item)
+                    for name, location, time, item in read_rows(filename)]
+        assert len(expected) == text.count(",", 0) // 3
+        assert list(map_rows(filename)) == expected
+
+
+def test_map_rows_range(tmpdir):
+    """Test reading part of a file"""
+    filename = write_file(tmpdir,
+                          "Bob,Starbucks,1970-01-02 02:53:00,shoes\n"
+                          "Jane,Starbucks,1970-01-02 03:53:00,Mits\n")
+
+    assert [row[0] for row in map_rows(filename, 0, 40)] == ["Bob"]
+    assert [row[0] for row in map_rows(filename, 40)] == ["Jane"]
+
+
+def test_map_rows_errors(tmpdir):
+    """Test that bad rows raise a ValueError"""
+    for text in ("Bob,Starbucks,1970-01-02 02:53:00\n",
+                 "Bob,Starbucks,1970-01-02 02:53:00,shoes,socks\n",
+                 "Bob,Starbucks,1970-01-02 02:53:00,shoes\n\n",
+                 "Bob,Starbucks,1970-01-02 02:53,shoes\n"):
+        filename = write_file(tmpdir, text)
+        with pytest.raises(ValueError):
+            list(map_rows(filename))
+
+    # Empty files are fine, though
+    assert list(map_rows(write_file(tmpdir, ""))) == []
+
+
+def test_compressed(tmpdir):
+    """Test that compressed files read the same as the plain file"""
+    text = ("Bob,Starbucks,1970-01-02 02:53:00,shoes\r\n"
+            "BZh9,Starbucks,1970-01-02 03:53:00,Mits\n"
+            "Zoe,My house,1970-01-02 05:53:00,")
+    filename = write_file(tmpdir, text)
+    assert compression(filename) is None
+    expected = list(map_rows(filename))
+
+    for kind, compress in (('gzip', gzip.compress), ('bz2', bz2.compress),
+                           ('xz', lzma.compress)):
+        compressed = tmpdir.join('observations.csv.' + kind)
+        compressed.write_binary(compress(text.encode('utf-8')))
+        filename = str(compressed)
+        assert compression(filename) == kind
+        assert list(map_rows(filename)) == expected
+        assert list(read_rows(filename)) == list(read_rows(write_file(
+            tmpdir, text)))
+        with pytest.raises(ValueError):
+            list(map_rows(filename, 40))
@@ -0,0 +1,135 @@
+"""Tests for observation_stream module
+"""
+import pytest
+import random
+
+from datetime import datetime, timedelta
+
+from observation import Observation
+from observation_stream import (DuplicateFilter, external_sort,
+                                stream_rendezvous)
+from observation_timeline import DataError, ObservationTimeline
+
+
+def random_observations(count=200):
+    """A helper function that returns Observations at random locations
+
+    :param int count: The number of Observations to return
+
+    :return: a list of Observation instances in a random order.
+    """
+    observations = []
+    for i in range(count):
+        time = datetime(1970, 1, 2) + timedelta(minutes=random.randint(0,
+                                                                       5000))
+        observations.append(Observation(str(i), random.choice("ABCDEFGHIJ"),
+                                        str(time)))
+    random.shuffle(observations)
+    return observations
+
+
+def rendezvous_or_error(rendezvous):
+    """A helper function that collects rendezvous up to any DataError
+
+    :param iterable rendezvous: A rendezvous generator
+
+    :return: a list of rendezvous, ending in DataError if one was raised
+    """
+    found = []
+    try:
+        for rend in rendezvous:
+            found.append(rend)
+    except DataError:
+        found.append(DataError)
+    return found
+
+
+def calm_observations(count=100):
+    """A helper function that returns Observations at random locations,
+    with no window too crowded
+
+    :param int count: The number of Observations to return
+
+    :return: a list of Observation instances in a random order.
+    """
+    while True:
+        observations = random_observations(count)
+        timeline = ObservationTimeline.from_iterable(observations)
+        if DataError not in rendezvous_or_error(timeline.rendezvous()):
+            return observations
+
+
+def test_stream_rendezvous():
+    """Test that streaming finds the same rendezvous as the timeline."""
+    for _ in range(20):
+        timeline = ObservationTimeline.from_iterable(random_observations())
+
+        assert (rendezvous_or_error(
+                    stream_rendezvous(timeline.observations)) ==
+                rendezvous_or_error(timeline.rendezvous()))
+
+
+def test_stream_rendezvous_counts():
+    """Test that streaming looks at the same windows as the timeline."""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    timeline = ObservationTimeline.from_iterable(calm_observations())
+    for bounds in ((None, None), (start, end)):
+        counts = {}
+        expected = {}
+        list(stream_rendezvous(timeline.observations, timedelta(0, 3600),
+                               *bounds, counts=counts))
+        list(timeline.rendezvous(timedelta(0, 3600), *bounds,
+                                 counts=expected))
+        assert counts == expected
+
+
+def test_stream_rendezvous_order():
+    """Test that streaming needs observations in time order."""
+    observations = [
+        Observation("Skeletor", "Starbucks", "1970-01-02 03:53:00"),
+        Observation("Doc Oc", "Starbucks", "1970-01-02 02:53:00"),
+    ]
+    with pytest.raises(ValueError):
+        list(stream_rendezvous(observations))
+
+
+def test_external_sort():
+    """Test that external sorting matches an in-memory sort."""
+    observations = random_observations()
+    expected = ObservationTimeline.from_iterable(observations).observations
+
+    # Enough runs that some have to be merged twice
+    in_order = list(external_sort(observations, run_size=7, fan_in=3))
+    assert ([(o.name, o.location, o.time) for o in in_order] ==
+            [(o.name, o.location, o.time) for o in expected])
+
+
+def test_stream_rendezvous_range():
+    """Test that a time range gives the same rendezvous as a timeline"""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(20):
+        observations = random_observations()
+        timeline = ObservationTimeline.from_iterable(observations)
+        assert (rendezvous_or_error(stream_rendezvous(
+                    timeline.observations, start=start, end=end)) ==
+                rendezvous_or_error(timeline.rendezvous(start=start,
+                                                        end=end)))
+
+
+def test_duplicate_filter():
+    """Test that only repeats are dropped, in any order or time order."""
+    observations = random_observations()
+    repeated = observations + [Observation(o.name, o.location, str(o.time))
+                               for o in observations[:50]]
+    random.shuffle(repeated)
+    duplicates = DuplicateFilter()
+    unique = list(duplicates.filter(repeated))
+    assert sorted(unique, key=str) == sorted(observations, key=str)
+    assert duplicates.dropped == 50
+
+    in_order = sorted(repeated, key=lambda o: o.key)
+    assert (list(duplicates.filter(in_order, in_order=True)) ==
+            sorted(unique, key=lambda o: o.key))
+    assert duplicates.dropped == 100
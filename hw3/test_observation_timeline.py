@@ -3,12 +3,14 @@
 Feel free to add more tests as you see fit.
 
 """
+import pytest
 import random
 
 from datetime import datetime, timedelta
 
 from observation import Observation
-from observation_timeline import ObservationTimeline
+from observation_timeline import DataError, ObservationTimeline
+from test_observation_stream import calm_observations
 
 
 def random_timed_observations(count=100):
@@ -210,3 +212,186 @@ def test_window_enumeration():
         # We know they're sorted, so just check first and last.
         assert (window[0].time + timedelta(hours=1)) > window[-1].time
     assert i == len(timeline.observations) - 1
+
+
+def test_add_keeps_ties_in_order():
+    """Test that Observations with the same time stay in insertion order."""
+    timeline = ObservationTimeline()
+    timeline.add(Observation("A", "Starbucks", "1970-01-02 03:00:00"))
+    timeline.add(Observation("B", "Starbucks", "1970-01-02 02:00:00"))
+    timeline.add(Observation("C", "Starbucks", "1970-01-02 03:00:00"))
+    timeline.add(Observation("D", "Starbucks", "1970-01-02 02:00:00"))
+
+    assert [o.name for o in timeline.observations] == ["B", "D", "A", "C"]
+
+
+def test_add_many():
+    """Test that add_many orders the same way as repeated add calls."""
+    observations = random_timed_observations()
+    # Throw in some ties, including ties with existing observations
+    observations += [Observation(str(i), "Starbucks", str(o.time))
+                     for i, o in enumerate(observations[:20])]
+
+    one_at_a_time = ObservationTimeline()
+    for o in observations:
+        one_at_a_time.add(o)
+
+    # Add half in bulk on top of a partly filled timeline
+    bulk = ObservationTimeline()
+    for o in observations[:50]:
+        bulk.add(o)
+    bulk.add_many(observations[50:])
+
+    assert bulk.observations == one_at_a_time.observations
+    assert (ObservationTimeline.from_iterable(observations).observations ==
+            one_at_a_time.observations)
+
+    # Adding after a bulk load still works
+    late = Observation("Late", "Starbucks", "1970-01-01 00:00:00")
+    bulk.add(late)
+    assert bulk.observations[0] is late
+
+
+def test_window_ranges():
+    """Test that window ranges match the windows they describe."""
+    timeline = random_timed_observation_timeline()
+
+    windows = list(timeline.windows())
+    ranges = list(timeline.window_ranges())
+    assert len(windows) == len(ranges) == len(timeline.observations)
+    for window, (start, end) in zip(windows, ranges):
+        assert window == tuple(timeline.observations[start:end])
+        # The window stops at the first observation outside of it
+        if end < len(timeline.observations):
+            assert (timeline.observations[end].time - window[0].time >=
+                    timedelta(hours=1))
+
+    # Skipping singletons only drops the windows of length one
+    assert (list(timeline.windows(skip_singletons=True)) ==
+            [w for w in windows if len(w) > 1])
+
+
+def test_rendezvous_window_size():
+    """Test that rendezvous respects window_size."""
+    timeline = ObservationTimeline()
+    timeline.add(Observation("Skeletor", "Starbucks", "1970-01-02 02:53:00"))
+    timeline.add(Observation("Doc Oc", "Starbucks", "1970-01-02 03:05:00"))
+
+    assert len(list(timeline.rendezvous())) == 1
+    assert list(timeline.rendezvous(timedelta(minutes=10))) == []
+
+
+def test_rendezvous_locations():
+    """Test that only observations at the same location rendezvous."""
+    timeline = ObservationTimeline()
+    timeline.add(Observation("Skeletor", "Starbucks", "1970-01-02 02:53:00"))
+    timeline.add(Observation("Shredder", "Arby's", "1970-01-02 02:55:00"))
+    timeline.add(Observation("Doc Oc", "Starbucks", "1970-01-02 03:05:00"))
+    timeline.add_many([
+        Observation("Joker", "Arby's", "1970-01-02 02:54:00"),
+        Observation("Bane", "Arby's", "1970-01-02 06:00:00"),
+        Observation("Riddler", "Arby's", "1970-01-02 06:10:00"),
+    ])
+
+    pairs = [(s1.name, s2.name) for s1, s2 in timeline.rendezvous()]
+    # In time order, across locations
+    assert pairs == [("Skeletor", "Doc Oc"), ("Joker", "Shredder"),
+                     ("Bane", "Riddler")]
+
+
+def test_rendezvous_data_error():
+    """Test that a crowded window raises a DataError when reached."""
+    timeline = ObservationTimeline()
+    timeline.add(Observation("Skeletor", "Starbucks", "1970-01-02 02:53:00"))
+    timeline.add(Observation("Doc Oc", "Starbucks", "1970-01-02 03:05:00"))
+    timeline.add(Observation("Joker", "Arby's", "1970-01-02 05:00:00"))
+    timeline.add(Observation("Bane", "Arby's", "1970-01-02 05:10:00"))
+    timeline.add(Observation("Riddler", "Arby's", "1970-01-02 05:20:00"))
+
+    rendezvous = timeline.rendezvous()
+    # The first rendezvous comes out before the error
+    assert next(rendezvous)[0].name == "Skeletor"
+    with pytest.raises(DataError):
+        next(rendezvous)
+
+
+def test_between():
+    """Test that time range queries match a scan of every observation"""
+    timeline = random_timed_observation_timeline()
+    observations = timeline.observations
+    for _ in range(20):
+        start = observations[random.randrange(100)].time
+        end = start + timedelta(minutes=random.randint(0, 600))
+        assert timeline.between(start, end) == [
+            o for o in observations if start <= o.time < end]
+        assert timeline.before(start) == [
+            o for o in observations if o.time < start]
+        assert timeline.after(start) == [
+            o for o in observations if o.time >= start]
+
+
+def test_trajectory():
+    """Test that each suspect's trajectory matches a scan, as observations
+    are added one at a time and in batches"""
+    timeline = ObservationTimeline()
+    for _ in range(5):
+        observations = [Observation(random.choice("ABC"), str(i), str(
+            datetime(1970, 1, 2) + timedelta(minutes=random.randint(0, 600))))
+            for i in range(20)]
+        timeline.add_many(observations[:10])
+        for o in observations[10:]:
+            timeline.add(o)
+        start = datetime(1970, 1, 2, random.randint(0, 5))
+        end = start + timedelta(hours=random.randint(0, 5))
+        for name in "ABC":
+            assert timeline.trajectory(name) == [
+                o for o in timeline.observations if o.name == name]
+            assert timeline.trajectory(name, start, end) == [
+                o for o in timeline.between(start, end) if o.name == name]
+    assert timeline.trajectory("D") == []
+
+
+def test_rendezvous_range():
+    """Test that rendezvous in a time range are the ones starting in it"""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(20):
+        timeline = ObservationTimeline()
+        for i in range(100):
+            time = datetime(1970, 1, 2) + timedelta(
+                minutes=random.randint(0, 5000))
+            timeline.add(Observation(str(i), random.choice("ABCDEFGHIJ"),
+                                     str(time)))
+        try:
+            found = list(timeline.rendezvous())
+        except DataError:
+            continue
+        assert list(timeline.rendezvous(start=start, end=end)) == [
+            rend for rend in found if start <= rend[0].time < end]
+        assert list(timeline.rendezvous(start=start)) == [
+            rend for rend in found if start <= rend[0].time]
+        assert list(timeline.rendezvous(end=end)) == [
+            rend for rend in found if rend[0].time < end]
+
+
+def test_rendezvous_counts():
+    """Test that every window in the range is counted, along with the
+    others at its location"""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(20):
+        timeline = ObservationTimeline.from_iterable(calm_observations())
+        for low, high in ((None, None), (start, end)):
+            windows = 0
+            comparisons = 0
+            for window in timeline.windows():
+                first = window[0]
+                if ((low is None or first.time >= low) and
+                        (high is None or first.time < high)):
+                    windows += 1
+                    comparisons += min(2, sum(o.location == first.location
+                                              for o in window[1:]))
+            counts = {}
+            list(timeline.rendezvous(start=low, end=high, counts=counts))
+            assert counts == {'windows generated': windows,
+                              'pairwise comparisons': comparisons}
@@ -0,0 +1,98 @@
+"""Tests for output_writer module
+"""
+import csv
+import io
+import json
+
+from observation import Observation
+from output_writer import CsvWriter, JsonLinesWriter, TextWriter, open_writer
+
+
+def write_everything(writer):
+    """A helper function that writes one of each kind of record
+
+    :param writer: The writer to use
+
+    :return: None
+    """
+    writer.exchange(Observation("Bob", "Starbucks", "1970-01-02 02:53:00"),
+                    Observation("Jane", "Starbucks", "1970-01-02 02:54:00"),
+                    "shoes", "Mits")
+    writer.carrying({"Bob": "Mits", "Jane": "shoes"})
+    writer.owner("Bob", "Mits")
+    writer.owner("Jane", "Mits", "1970-01-02 02:00:00")
+    writer.transfer("Mits", "1970-01-02 02:53:00", "Jane", "Bob",
+                    "Starbucks")
+    writer.observation(Observation("Bob", "Home", "1970-01-02 03:00:00"))
+    writer.close()
+
+
+def test_text():
+    """Test that text looks the same as it always has"""
+    stream = io.StringIO()
+    write_everything(TextWriter(stream))
+    assert stream.getvalue() == (
+        "Bob meets with Jane to exchange shoes for Mits.\n"
+        "{'Bob': 'Mits', 'Jane': 'shoes'}\n"
+        "Bob had the Mits\n"
+        "Jane had the Mits at 1970-01-02 02:00:00\n"
+        "Mits went from Jane to Bob at Starbucks (1970-01-02 02:53:00)\n"
+        "Bob was at Home at 1970-01-02 03:00:00\n")
+
+
+def test_json_lines():
+    """Test that each record is a JSON object on its own line"""
+    stream = io.StringIO()
+    write_everything(JsonLinesWriter(stream))
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records == [
+        {"type": "exchange", "time": "1970-01-02 02:53:00",
+         "location": "Starbucks", "first": "Bob", "second": "Jane",
+         "first_item": "shoes", "second_item": "Mits"},
+        {"type": "carrying", "time": None, "name": "Bob", "item": "Mits"},
+        {"type": "carrying", "time": None, "name": "Jane", "item": "shoes"},
+        {"type": "owner", "time": None, "name": "Bob", "item": "Mits"},
+        {"type": "owner", "time": "1970-01-02 02:00:00", "name": "Jane",
+         "item": "Mits"},
+        {"type": "transfer", "time": "1970-01-02 02:53:00",
+         "location": "Starbucks", "item": "Mits", "from": "Jane",
+         "to": "Bob"},
+        {"type": "observation", "time": "1970-01-02 03:00:00",
+         "location": "Home", "name": "Bob"}]
+
+
+def test_csv():
+    """Test that each record is a row under the header"""
+    stream = io.StringIO()
+    write_everything(CsvWriter(stream))
+    rows = list(csv.reader(io.StringIO(stream.getvalue())))
+    assert rows == [
+        list(CsvWriter.COLUMNS),
+        ["exchange", "1970-01-02 02:53:00", "Starbucks", "Bob", "shoes",
+         "Jane", "Mits"],
+        ["carrying", "", "", "Bob", "Mits", "", ""],
+        ["carrying", "", "", "Jane", "shoes", "", ""],
+        ["owner", "", "", "Bob", "Mits", "", ""],
+        ["owner", "1970-01-02 02:00:00", "", "Jane", "Mits", "", ""],
+        ["transfer", "1970-01-02 02:53:00", "Starbucks", "Jane", "Mits",
+         "Bob", ""],
+        ["observation", "1970-01-02 03:00:00", "Home", "Bob", "", "", ""]]
+
+
+def test_open_writer(tmpdir):
+    """Test that buffered output still ends up in the file"""
+    filename = str(tmpdir.join('out.jsonl'))
+    with open(filename, 'w') as f:
+        f.write("first\n")
+        writer = open_writer('jsonl', f)
+        assert writer.stream is not f
+        writer.owner("Bob", "Mits")
+        writer.close()
+        f.write("last\n")
+    with open(filename) as f:
+        assert f.read().splitlines() == [
+            "first", json.dumps({"type": "owner", "time": None,
+                                 "name": "Bob", "item": "Mits"}), "last"]
+
+    stream = io.StringIO()
+    assert open_writer('csv', stream).stream is stream
@@ -0,0 +1,102 @@
+"""Tests for ownership module
+"""
+import pytest
+
+from observation import Observation
+from ownership import Ownership
+
+
+def meet(ownership, first, second):
+    """A helper function that exchanges items between two suspects
+
+    :param Ownership ownership: Who owns what
+
+    :param str first: The first suspect's name
+
+    :param str second: The second suspect's name
+
+    :return: None
+    """
+    ownership.exchange(
+        Observation(first, "Starbucks", "1970-01-02 02:53:00"),
+        Observation(second, "Starbucks", "1970-01-02 02:54:00"))
+
+
+def test_exchange():
+    """Test that exchanges keep both directions up to date"""
+    carrying = {"Bob": "shoes", "Jane": "Mits", "Dalton": "shoes"}
+    ownership = Ownership(carrying)
+    assert ownership.owners("shoes") == ["Bob", "Dalton"]
+
+    meet(ownership, "Bob", "Jane")
+    assert carrying == {"Bob": "Mits", "Jane": "shoes", "Dalton": "shoes"}
+    assert ownership.owners("shoes") == ["Jane", "Dalton"]
+    assert ownership.owners("Mits") == ["Bob"]
+
+    # Swapping the same item doesn't change anything
+    meet(ownership, "Jane", "Dalton")
+    assert ownership.owners("shoes") == ["Jane", "Dalton"]
+
+    meet(ownership, "Dalton", "Bob")
+    assert ownership.owners("shoes") == ["Bob", "Jane"]
+    assert ownership.owners("Mits") == ["Dalton"]
+    assert ownership.owners("socks") == []
+
+
+def test_exchange_without_item():
+    """Test that a suspect has to be carrying something"""
+    ownership = Ownership({"Bob": "shoes"})
+    with pytest.raises(KeyError):
+        meet(ownership, "Bob", "Jane")
+
+
+def test_at():
+    """Test looking up owners at earlier times"""
+    names = ["Suspect {}".format(i) for i in range(6)]
+    carrying = {name: "item {}".format(i) for i, name in enumerate(names)}
+    initial = dict(carrying)
+    # Check every way of lining up with the checkpoints
+    ownership = Ownership(carrying, checkpoint_every=3)
+
+    history = []
+    for minute in range(20):
+        first = Observation(names[minute % 6], "Starbucks",
+                            "1970-01-02 02:{:02}:00".format(minute))
+        second = Observation(names[(minute * 5 + 1) % 6], "Starbucks",
+                             "1970-01-02 02:{:02}:30".format(minute))
+        if first.name == second.name:
+            continue
+        ownership.exchange(first, second)
+        history.append((first.key, dict(carrying)))
+
+    before = history[0][0] - 1
+    assert ownership.carrying_at(before) == initial
+    assert ownership.owners_at("item 0", before) == ["Suspect 0"]
+    for key, expected in history:
+        assert ownership.carrying_at(key) == expected
+        for item in initial.values():
+            assert ownership.owners_at(item, key) == [
+                name for name in names if expected[name] == item]
+
+
+def test_provenance():
+    """Test that each item's changes of hands are kept in order"""
+    ownership = Ownership({"Bob": "shoes", "Jane": "Mits", "Dalton": "shoes"})
+    meet(ownership, "Bob", "Jane")
+    # Swapping the same item doesn't change hands
+    meet(ownership, "Jane", "Dalton")
+    meet(ownership, "Dalton", "Bob")
+    key = Observation("Bob", "Starbucks", "1970-01-02 02:53:00").key
+    assert ownership.provenance("shoes") == [
+        (key, "Bob", "Jane", "Starbucks"),
+        (key, "Dalton", "Bob", "Starbucks")]
+    assert ownership.provenance("Mits") == [
+        (key, "Jane", "Bob", "Starbucks"),
+        (key, "Bob", "Dalton", "Starbucks")]
+    assert ownership.provenance("socks") == []
+
+    ownership.rewind(1)
+    assert ownership.provenance("shoes") == [(key, "Bob", "Jane", "Starbucks")]
+    assert ownership.provenance("Mits") == [(key, "Jane", "Bob", "Starbucks")]
+    ownership.rewind(0)
+    assert ownership.provenance("shoes") == []
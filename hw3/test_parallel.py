@@ -0,0 +1,172 @@
+"""Tests for parallel module
+"""
+import gzip
+
+import pytest
+
+from datetime import datetime
+
+import parallel
+from main import load_timeline
+from observation_timeline import ObservationTimeline
+from parallel import (chunk_ranges, find_rendezvous, load_observations,
+                      member_ranges)
+from test_observation_stream import (calm_observations, random_observations,
+                                     rendezvous_or_error)
+
+
+def write_observations(tmpdir, lines):
+    """A helper function that writes an observations CSV file
+
+    :param tmpdir: pytest's tmpdir fixture
+
+    :param list lines: The rows of the file, without newlines
+
+    :return: The name of the file
+    """
+    csv = tmpdir.join('observations.csv')
+    csv.write("".join(line + "\n" for line in lines))
+    return str(csv)
+
+
+def test_chunk_ranges(tmpdir):
+    """Test that chunks cover the file and start at the start of lines"""
+    lines = ["Suspect {},Starbucks,1970-01-02 0{}:00:00,".format(i, i % 10)
+             for i in range(50)]
+    filename = write_observations(tmpdir, lines)
+
+    for chunks in (1, 2, 7, 100):
+        ranges = chunk_ranges(filename, chunks)
+        assert ranges[0][0] == 0
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+
+        with open(filename, 'rb') as f:
+            data = f.read()
+        assert ranges[-1][1] == len(data)
+        pieces = [data[start:end] for start, end in ranges]
+        assert all(piece.endswith(b"\n") for piece in pieces)
+        assert b"".join(pieces) == data
+
+
+def test_load_observations(tmpdir):
+    """Test that parallel loading matches load_timeline"""
+    lines = ["Suspect {},Starbucks,1970-01-02 0{}:00:00,item {}".format(
+        i % 7, i % 10, i) for i in range(50)]
+    filename = write_observations(tmpdir, lines)
+
+    carrying, timeline = load_timeline(filename)
+    parallel_carrying, observations = load_observations(filename, 3)
+
+    assert parallel_carrying == carrying
+    assert ([(o.name, o.location, o.time) for o in observations] ==
+            [(o.name, o.location, o.time) for o in timeline.observations])
+
+    parallel_carrying, timeline = load_timeline(filename, jobs=3)
+    assert parallel_carrying == carrying
+
+
+def test_load_observations_error(tmpdir):
+    """Test that a bad row is reported by its line number"""
+    lines = ["Suspect,Starbucks,1970-01-02 00:00:00,"] * 20
+    lines[13] = "Suspect,Starbucks,1970-01-02 00:00:00"
+    lines[17] = "Suspect,Starbucks,1970-01- 00:00:00,"
+    filename = write_observations(tmpdir, lines)
+
+    with pytest.raises(ValueError) as error:
+        load_observations(filename, 4)
+    assert "line 14" in str(error.value)
+
+
+def write_members(tmpdir, lines, cuts):
+    """A helper function that writes an observations CSV file as a gzip
+    file of several members
+
+    :param tmpdir: pytest's tmpdir fixture
+
+    :param list lines: The rows of the file, without newlines
+
+    :param list cuts: Where in the text each member after the first
+        starts
+
+    :return: The name of the file
+    """
+    data = "".join(line + "\n" for line in lines).encode('utf-8')
+    bounds = [0] + cuts + [len(data)]
+    compressed = tmpdir.join('observations.csv.gz')
+    compressed.write_binary(b"".join(
+        gzip.compress(data[start:end])
+        for start, end in zip(bounds, bounds[1:])))
+    return str(compressed)
+
+
+def test_load_members(tmpdir):
+    """Test that a gzip file of several members loads the same as the
+    plain file, even with lines that run between members"""
+    lines = ["Suspect {},Starbucks,1970-01-02 0{}:00:00,item {}".format(
+        i % 7, i % 10, i) for i in range(50)]
+    carrying, timeline = load_timeline(write_observations(tmpdir, lines))
+    expected = [(o.name, o.location, o.time) for o in timeline.observations]
+
+    # Cut between lines, part way through them, and a member with no
+    # newline in it at all
+    filename = write_members(tmpdir, lines, [45, 600, 610, 1200, 1800])
+    assert len(member_ranges(filename, 100)) == 6
+    parallel_carrying, observations = load_observations(filename, 6)
+    assert parallel_carrying == carrying
+    assert [(o.name, o.location, o.time) for o in observations] == expected
+
+    lines[13] = "Suspect,Starbucks,1970-01-02 00:00:00"
+    filename = write_members(tmpdir, lines, [600, 620, 640])
+    with pytest.raises(ValueError) as error:
+        load_observations(filename, 4)
+    assert "line 14" in str(error.value)
+
+
+def test_load_members_false_start(tmpdir, monkeypatch):
+    """Test that a range that does not start at a member is read again
+    by one process"""
+    lines = ["Suspect {},Starbucks,1970-01-02 0{}:00:00,item {}".format(
+        i % 7, i % 10, i) for i in range(50)]
+    carrying, timeline = load_timeline(write_observations(tmpdir, lines))
+    filename = write_members(tmpdir, lines, [])
+
+    monkeypatch.setattr(parallel, 'member_ranges',
+                        lambda filename, chunks: [(0, 100), (100, 200)])
+    parallel_carrying, observations = load_observations(filename, 2)
+    assert parallel_carrying == carrying
+    assert ([(o.name, o.location, o.time) for o in observations] ==
+            [(o.name, o.location, o.time) for o in timeline.observations])
+
+
+def test_find_rendezvous():
+    """Test that parallel rendezvous match the timeline's own"""
+    for count in (0, 5, 50, 200):
+        timeline = ObservationTimeline.from_iterable(
+            random_observations(count))
+        expected = rendezvous_or_error(timeline.rendezvous())
+        for jobs in (1, 3):
+            assert rendezvous_or_error(find_rendezvous(timeline,
+                                                       jobs)) == expected
+
+
+def test_find_rendezvous_counts():
+    """Test that the processes count the windows like the timeline"""
+    timeline = ObservationTimeline.from_iterable(calm_observations())
+    counts = {}
+    expected = {}
+    list(find_rendezvous(timeline, 3, counts=counts))
+    list(timeline.rendezvous(counts=expected))
+    assert counts == expected
+
+
+def test_find_rendezvous_range():
+    """Test that parallel rendezvous in a time range match the timeline's"""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    timeline = ObservationTimeline.from_iterable(random_observations())
+    for bounds in ((start, None), (None, end), (start, end)):
+        expected = rendezvous_or_error(timeline.rendezvous(end=bounds[1],
+                                                           start=bounds[0]))
+        assert rendezvous_or_error(find_rendezvous(
+            timeline, 2, start=bounds[0], end=bounds[1])) == expected
@@ -0,0 +1,89 @@
+"""Tests for profiling module
+"""
+import json
+
+import pytest
+
+import profiling
+from profiling import Profile
+
+
+class FakeClock:
+    """Stands in for perf_counter, and only moves on when told to
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A FakeClock that the profiling module reads the time from"""
+    clock = FakeClock()
+    monkeypatch.setattr(profiling, 'perf_counter', clock)
+    return clock
+
+
+def test_stages(clock):
+    """Test that time in an inner stage isn't counted twice"""
+    profile = Profile()
+    with profile.stage('outer'):
+        clock.sleep(1)
+        with profile.stage('inner'):
+            clock.sleep(2)
+    stages = {stage['name']: stage for stage in profile.report()['stages']}
+    assert stages['inner']['seconds'] == 2
+    assert stages['outer']['seconds'] == 1
+    assert stages['inner']['peak_memory'] > 0
+
+
+def test_iterate(clock):
+    """Test that only the time spent getting values counts"""
+    def slow():
+        for i in range(3):
+            clock.sleep(1)
+            yield i
+
+    profile = Profile()
+    with profile.stage('loop'):
+        values = []
+        for value in profile.iterate('values', slow(), 'values given'):
+            clock.sleep(0.5)
+            values.append(value)
+        assert values == [0, 1, 2]
+    stages = {stage['name']: stage for stage in profile.report()['stages']}
+    assert stages['values']['seconds'] == 3
+    assert stages['loop']['seconds'] == 1.5
+    assert profile.counters == {'values given': 3}
+
+    # Errors still count towards the stage
+    with pytest.raises(ZeroDivisionError):
+        list(profile.iterate('error', (1 / 0 for _ in range(1))))
+    assert [stage['name'] for stage in profile.report()['stages']] == [
+        'loop', 'values', 'error']
+
+
+def test_disabled():
+    """Test that a disabled profile measures nothing"""
+    profile = Profile(enabled=False)
+    with profile.stage('stage'):
+        profile.count('things', 3)
+    assert list(profile.iterate('values', range(3), 'values')) == [0, 1, 2]
+    assert profile.report()['stages'] == []
+    assert profile.report()['counters'] == {}
+
+
+def test_write(tmpdir):
+    """Test that the report is written as JSON"""
+    profile = Profile()
+    profile.count('things', 3)
+    profile.count('things')
+    filename = str(tmpdir.join('profile.json'))
+    profile.write(filename)
+    with open(filename) as f:
+        assert json.load(f)['counters'] == {'things': 4}
@@ -0,0 +1,130 @@
+"""Tests for sqlite_timeline module
+"""
+from datetime import datetime, timedelta
+
+from observation_timeline import ObservationTimeline
+from sqlite_timeline import SqliteTimeline
+from test_observation_stream import (calm_observations, random_observations,
+                                     rendezvous_or_error)
+
+
+def test_add(tmpdir):
+    """Test that observations end up in the same order as a timeline, and
+    stay in the database file."""
+    observations = random_observations()
+    filename = str(tmpdir.join('timeline.db'))
+
+    stored = SqliteTimeline(filename)
+    timeline = ObservationTimeline.from_iterable(observations[:100])
+    stored.add_many(observations[:100])
+    for o in observations[100:150]:
+        stored.add(o)
+        timeline.add(o)
+    stored.close()
+
+    stored = SqliteTimeline(filename)
+    stored.add_many(observations[150:])
+    timeline.add_many(observations[150:])
+    assert len(stored) == len(observations)
+    assert stored.observations == timeline.observations
+    stored.close()
+
+
+def test_carrying(tmpdir):
+    """Test that carried items are updated like a dictionary, and stay in
+    the database file."""
+    filename = str(tmpdir.join('timeline.db'))
+    stored = SqliteTimeline(filename)
+    stored.add_carrying({"Bob": "shoes", "Jane": "Mits"})
+    stored.close()
+
+    stored = SqliteTimeline(filename)
+    stored.add_carrying({"Zoe": "hat", "Bob": "socks"})
+    carrying = {"Bob": "shoes", "Jane": "Mits"}
+    carrying.update({"Zoe": "hat", "Bob": "socks"})
+    assert list(stored.carrying.items()) == list(carrying.items())
+    stored.close()
+
+
+def test_windows():
+    """Test that windows match the ones from a timeline."""
+    observations = random_observations()
+    stored = SqliteTimeline.from_iterable(observations)
+    timeline = ObservationTimeline.from_iterable(observations)
+
+    for size in (timedelta(minutes=1), timedelta(hours=1)):
+        for skip_singletons in (False, True):
+            assert (list(stored.window_ranges(size, skip_singletons)) ==
+                    list(timeline.window_ranges(size, skip_singletons)))
+            assert (list(stored.windows(size, skip_singletons)) ==
+                    list(timeline.windows(size, skip_singletons)))
+    stored.close()
+
+
+def test_rendezvous():
+    """Test that rendezvous match the ones from a timeline, in and out of
+    a time range."""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(20):
+        observations = random_observations()
+        stored = SqliteTimeline.from_iterable(observations)
+        timeline = ObservationTimeline.from_iterable(observations)
+        for bounds in ((None, None), (start, None), (None, end),
+                       (start, end)):
+            found = rendezvous_or_error(stored.rendezvous(
+                timedelta(0, 3600), *bounds))
+            assert found == rendezvous_or_error(timeline.rendezvous(
+                timedelta(0, 3600), *bounds))
+        stored.close()
+
+
+def test_queries():
+    """Test that time range and trajectory queries match a timeline's."""
+    observations = random_observations()
+    for i, o in enumerate(observations):
+        o.name = str(i % 7)
+    stored = SqliteTimeline.from_iterable(observations)
+    timeline = ObservationTimeline.from_iterable(observations)
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    assert stored.between(start, end) == timeline.between(start, end)
+    assert stored.before(end) == timeline.before(end)
+    assert stored.after(end) == timeline.after(end)
+    for name in "01234567":
+        assert stored.trajectory(name) == timeline.trajectory(name)
+        assert (stored.trajectory(name, start, end) ==
+                timeline.trajectory(name, start, end))
+    stored.close()
+
+
+def test_duplicates():
+    """Test that repeats of an observation are counted and left out."""
+    observations = random_observations()
+    stored = SqliteTimeline.from_iterable(observations)
+    stored.add_many(observations[:20])
+    stored.add(observations[20])
+    assert len(stored) == len(observations)
+    assert stored.dropped == 21
+    assert (stored.observations ==
+            ObservationTimeline.from_iterable(observations).observations)
+    stored.close()
+
+
+def test_rendezvous_counts():
+    """Test that the windows looked at are counted like a timeline's."""
+    start = datetime(1970, 1, 2, 20)
+    end = datetime(1970, 1, 3, 20)
+    for _ in range(5):
+        observations = calm_observations()
+        stored = SqliteTimeline.from_iterable(observations)
+        timeline = ObservationTimeline.from_iterable(observations)
+        for bounds in ((None, None), (start, end)):
+            counts = {}
+            expected = {}
+            list(stored.rendezvous(timedelta(0, 3600), *bounds,
+                                   counts=counts))
+            list(timeline.rendezvous(timedelta(0, 3600), *bounds,
+                                     counts=expected))
+            assert counts == expected
+        stored.close()
@@ -0,0 +1,76 @@
+"""Tests for timeline_cache module
+"""
+import os
+
+from columnar_timeline import ColumnarTimeline
+from main import load_cached_timeline, load_timeline
+from timeline_cache import cache_name, fingerprint, read_cache, write_cache
+
+
+def write_observations(tmpdir):
+    """A helper function that writes an observations CSV file
+
+    :param tmpdir: pytest's tmpdir fixture
+
+    :return: The name of the file
+    """
+    csv = tmpdir.join('observations.csv')
+    csv.write("Jane,Starbucks,1970-01-02 03:53:00,Mits\n"
+              "Bob,Starbucks,1970-01-02 02:53:00,shoes\n"
+              ",Arby's,1970-01-02 02:53:00,\n")
+    return str(csv)
+
+
+def test_round_trip(tmpdir):
+    """Test that a cached timeline matches the loaded one"""
+    filename = write_observations(tmpdir)
+    key = fingerprint(filename)
+    assert read_cache(filename, key) is None
+
+    carrying, timeline = load_timeline(filename)
+    write_cache(filename, key, carrying, timeline)
+    cached_carrying, cached = read_cache(filename, key)
+
+    assert cached_carrying == carrying
+    assert isinstance(cached, ColumnarTimeline)
+    assert ([(o.name, o.location, o.time) for o in cached.observations] ==
+            [(o.name, o.location, o.time) for o in timeline.observations])
+    assert ([(s1.name, s2.name) for s1, s2 in cached.rendezvous()] ==
+            [(s1.name, s2.name) for s1, s2 in timeline.rendezvous()])
+
+
+def test_stale(tmpdir):
+    """Test that a cache isn't used once the CSV file changes"""
+    filename = write_observations(tmpdir)
+    carrying, timeline = load_cached_timeline(filename)
+    assert os.path.exists(cache_name(filename))
+    assert read_cache(filename, fingerprint(filename)) is not None
+
+    # Same size and modification time, different contents
+    stat = os.stat(filename)
+    with open(filename, 'r+') as f:
+        f.write("June")
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert read_cache(filename, fingerprint(filename)) is None
+
+    carrying, timeline = load_cached_timeline(filename, ColumnarTimeline())
+    assert carrying == {"June": "Mits", "Bob": "shoes"}
+
+    # Rebuilt, so the next load comes from the cache again
+    carrying, cached = load_cached_timeline(filename, ColumnarTimeline())
+    assert carrying == {"June": "Mits", "Bob": "shoes"}
+    assert isinstance(cached.columns[0], memoryview)
+
+
+def test_corrupt(tmpdir):
+    """Test that a damaged cache is ignored"""
+    filename = write_observations(tmpdir)
+    load_cached_timeline(filename)
+
+    with open(cache_name(filename), 'r+b') as f:
+        f.truncate(100)
+    assert read_cache(filename, fingerprint(filename)) is None
+
+    with open(cache_name(filename), 'wb'):
+        pass
+    assert read_cache(filename, fingerprint(filename)) is None
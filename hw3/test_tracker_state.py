@@ -0,0 +1,229 @@
+"""Tests for tracker_state module
+"""
+import pytest
+import random
+
+from datetime import datetime, timedelta
+
+from observation import Observation
+from observation_stream import DuplicateFilter
+from observation_timeline import DataError, ObservationTimeline
+from ownership import Ownership
+from tracker_state import TrackerState
+
+
+def random_batch(count=30):
+    """A helper function that returns a batch of observations
+
+    :param int count: The number of Observations to return
+
+    :return: a (carrying, observations) tuple, with the observations in
+        a random order
+    """
+    carrying = {}
+    observations = []
+    for i in range(count):
+        name = "s" + str(random.randint(0, 19))
+        time = datetime(1970, 1, 2) + timedelta(minutes=random.randint(0,
+                                                                       5000))
+        location = random.choice("ABCDEFGHIJKLMNOP")
+        observations.append(Observation(name, location, str(time)))
+        if random.random() < 0.2:
+            carrying[name] = random.choice(["shoes", "Mits", "socks"])
+    return carrying, observations
+
+
+def replay(state, rendezvous):
+    """A helper function that replays rendezvous like main does
+
+    :param TrackerState state: The state to replay into
+
+    :param list rendezvous: Rendezvous returned by update()
+
+    :return: None
+    """
+    for first, second in rendezvous:
+        state.ownership.exchange(first, second)
+
+
+def test_update_matches_full_run():
+    """Test that updating batch by batch ends up like one full run"""
+    for _ in range(20):
+        # Everyone starts out with something, so they can all meet
+        carrying = {"s" + str(i): "hat" for i in range(20)}
+        state = TrackerState()
+        state.update(carrying, [])
+        observations = []
+        for _ in range(5):
+            batch_carrying, batch = random_batch()
+            carrying.update(batch_carrying)
+            observations += batch
+
+            # Repeats across batches are left out
+            timeline = ObservationTimeline.from_iterable(
+                dict.fromkeys(observations))
+            try:
+                expected = list(timeline.rendezvous())
+            except DataError:
+                expected = DataError
+            try:
+                replay(state, state.update(batch_carrying, batch))
+            except (DataError, KeyError):
+                # The full run gives up in the same places
+                break
+            assert state.rendezvous == expected
+
+            ownership = Ownership(dict(carrying))
+            for first, second in expected:
+                ownership.exchange(first, second)
+            assert state.ownership.carrying == ownership.carrying
+            assert list(state.ownership.carrying) == list(carrying)
+            for item in set(carrying.values()):
+                assert (state.ownership.provenance(item) ==
+                        ownership.provenance(item))
+
+
+def test_update_returns_only_new_rendezvous():
+    """Test that a later batch only replays what it could change"""
+    state = TrackerState()
+    found = list(state.update({"Bob": "shoes", "Jane": "Mits"}, [
+        Observation("Bob", "Starbucks", "1970-01-02 02:53:00"),
+        Observation("Jane", "Starbucks", "1970-01-02 02:54:00")]))
+    replay(state, found)
+    assert len(found) == 1
+    assert state.ownership.carrying == {"Bob": "Mits", "Jane": "shoes"}
+
+    found = list(state.update({"Dalton": "socks"}, [
+        Observation("Dalton", "My house", "1970-01-03 02:53:00"),
+        Observation("Jane", "My house", "1970-01-03 02:54:00")]))
+    replay(state, found)
+    assert [(a.name, b.name) for a, b in found] == [("Dalton", "Jane")]
+    assert state.ownership.carrying == {"Bob": "Mits", "Jane": "socks",
+                                        "Dalton": "shoes"}
+
+
+class Forgotten:
+    """Stands in for an observation that shouldn't be looked at again
+    """
+    def __getattr__(self, name):
+        raise AssertionError("Looked at the " + name +
+                             " of an old observation")
+
+
+def test_update_leaves_history_alone():
+    """Test that a later batch doesn't look at observations from before
+    the windows it could change"""
+    state = TrackerState()
+    carrying = {"s" + str(i): "hat" for i in range(20)}
+    replay(state, state.update(carrying, [
+        Observation("s" + str(i), "Starbucks",
+                    "1970-01-02 {:02}:00:00".format(i)) for i in range(20)]))
+
+    # Swap the whole history out from under the state
+    timeline = state.timeline
+    timeline.observations[:] = [Forgotten() for _ in timeline.observations]
+    for index in (timeline._locations, timeline._suspects):
+        for entries in index.values():
+            entries[:] = [(key, added, Forgotten())
+                          for key, added, _ in entries]
+
+    found = state.update({}, [
+        Observation("s1", "My house", "1970-01-03 02:54:00"),
+        Observation("s2", "My house", "1970-01-03 02:53:00")])
+    assert [(a.name, b.name) for a, b in found] == [("s2", "s1")]
+    assert len(timeline) == 22
+
+
+def test_update_is_lazy():
+    """Test that the rendezvous before a crowded window come out before
+    the DataError, as they do from the whole timeline"""
+    state = TrackerState()
+    found = state.update({"Bob": "shoes", "Jane": "Mits", "Zoe": "hat"}, [
+        Observation("Bob", "Starbucks", "1970-01-02 02:53:00"),
+        Observation("Jane", "Starbucks", "1970-01-02 02:54:00"),
+        Observation("Bob", "Home", "1970-01-02 05:53:00"),
+        Observation("Jane", "Home", "1970-01-02 05:54:00"),
+        Observation("Zoe", "Home", "1970-01-02 05:55:00")])
+    first, second = next(found)
+    assert (first.name, second.name) == ("Bob", "Jane")
+    with pytest.raises(DataError):
+        next(found)
+
+
+def test_update_drops_repeats():
+    """Test that an observation sent again in a later batch is left out"""
+    state = TrackerState()
+    bob = Observation("Bob", "Starbucks", "1970-01-02 02:53:00")
+    jane = Observation("Jane", "Starbucks", "1970-01-02 02:54:00")
+    replay(state, state.update({"Bob": "shoes", "Jane": "Mits"},
+                               [bob, jane]))
+
+    duplicates = DuplicateFilter()
+    found = state.update({}, [
+        Observation("Jane", "Starbucks", "1970-01-02 02:54:00"),
+        Observation("Jane", "Home", "1970-01-02 02:54:00"),
+        Observation("Jane", "Home", "1970-01-02 02:54:00")],
+        duplicates=duplicates)
+    replay(state, found)
+    assert duplicates.dropped == 2
+    assert len(state.timeline) == 3
+    assert [(a.name, b.name) for a, b in state.rendezvous] == [("Bob",
+                                                                "Jane")]
+    assert state.ownership.carrying == {"Bob": "Mits", "Jane": "shoes"}
+
+
+def test_save_and_load(tmpdir):
+    """Test that a saved state loads back the same"""
+    state = TrackerState()
+    replay(state, state.update({"Bob": "shoes", "Jane": "Mits"}, [
+        Observation("Bob", "Starbucks", "1970-01-02 02:53:00"),
+        Observation("Jane", "Starbucks", "1970-01-02 02:54:00")]))
+    filename = str(tmpdir.join('state'))
+    state.save(filename)
+
+    loaded = TrackerState.load(filename)
+    assert ([(str(a), str(b)) for a, b in loaded.rendezvous] ==
+            [(str(a), str(b)) for a, b in state.rendezvous])
+    assert loaded.ownership.carrying == state.ownership.carrying
+    assert ([str(o) for o in loaded.timeline.observations] ==
+            [str(o) for o in state.timeline.observations])
+
+
+def test_save_appends(tmpdir):
+    """Test that saving a loaded state only adds what changed to the
+    file"""
+    filename = str(tmpdir.join('state'))
+    state = TrackerState()
+    replay(state, state.update({"Bob": "shoes", "Jane": "Mits"}, [
+        Observation("Bob", "Starbucks", "1970-01-02 02:53:00"),
+        Observation("Jane", "Starbucks", "1970-01-02 02:54:00")]))
+    state.save(filename)
+    saved = tmpdir.join('state').read_binary()
+
+    for batch in ([Observation("Dalton", "Starbucks", "1970-01-02 04:00:00"),
+                   Observation("Bob", "Starbucks", "1970-01-02 04:10:00"),
+                   Observation("Bob", "Home", "1970-01-03 02:53:00")],
+                  [Observation("Jane", "Home", "1970-01-03 02:54:00")]):
+        state = TrackerState.load(filename)
+        replay(state, state.update({"Dalton": "socks"}, batch))
+        state.save(filename)
+        written = tmpdir.join('state').read_binary()
+        assert written.startswith(saved)
+        saved = written
+
+    loaded = TrackerState.load(filename)
+    assert [(a.name, b.name) for a, b in loaded.rendezvous] == [
+        ("Bob", "Jane"), ("Dalton", "Bob"), ("Bob", "Jane")]
+    assert loaded.ownership.carrying == {"Bob": "shoes", "Jane": "socks",
+                                         "Dalton": "Mits"}
+    assert loaded.initial == {"Bob": "shoes", "Jane": "Mits",
+                              "Dalton": "socks"}
+    assert len(loaded.timeline) == 6
+
+    # A save that never finished is left out, and then written over
+    tmpdir.join('state').write_binary(saved + saved[:10])
+    loaded = TrackerState.load(filename)
+    assert len(loaded.timeline) == 6
+    loaded.save(filename)
+    assert tmpdir.join('state').read_binary().startswith(saved)
+    assert len(TrackerState.load(filename).timeline) == 6
@@ -0,0 +1,157 @@
+import hashlib
+import mmap
+import os
+import struct
+
+from columnar_timeline import ColumnarTimeline
+
+MAGIC = b'VILETL01'
+"""Marks a file as a timeline cache, and which version of the layout"""
+
+# Magic, CSV size, CSV mtime, CSV hash, observations, and the byte
+# lengths of the name table, location table and carrying map. The
+# columns are stored in this machine's byte order, right after it.
+_HEADER = struct.Struct('=8sqq20sqqqq4x')
+
+
+def cache_name(filename):
+    """The name of the cache file that goes with a CSV file
+
+    :param str filename: The name of the observations CSV file
+
+    :rtype: str
+    """
+    return filename + '.cache'
+
+
+def fingerprint(filename):
+    """Identifies the current contents of a file
+
+    :param str filename: The name of the file
+
+    :return: The file's size, modification time in nanoseconds, and
+        SHA-1 digest
+
+    :rtype: tuple
+
+    :raises OSError: If there is an issue finding or opening the file
+    """
+    stat = os.stat(filename)
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return (stat.st_size, stat.st_mtime_ns, digest.digest())
+
+
+def write_cache(filename, key, carrying, timeline):
+    """Writes the cache file for a loaded CSV file
+
+    :param str filename: The name of the observations CSV file
+
+    :param tuple key: The fingerprint of the CSV file when it was loaded
+
+    :param dict carrying: Maps each suspect's name to their item
+
+    :param timeline: The timeline loaded from the CSV file
+
+    :return: None
+
+    :raises OSError: If the cache file cannot be written
+    """
+    if not isinstance(timeline, ColumnarTimeline):
+        timeline = ColumnarTimeline.from_iterable(timeline.observations)
+    columns = [memoryview(column).tobytes() for column in timeline.columns]
+    names = _join(timeline.name_table)
+    locations = _join(timeline.location_table)
+    items = _join(name + ',' + item for name, item in carrying.items())
+
+    size, mtime, digest = key
+    header = _HEADER.pack(MAGIC, size, mtime, digest, len(timeline),
+                          len(names), len(locations), len(items))
+    # Write a whole new file, then swap it in
+    temporary = cache_name(filename) + '.tmp'
+    with open(temporary, 'wb') as f:
+        for part in [header] + columns:
+            f.write(part)
+        # Keep the tables after the columns lined up on 8 bytes
+        f.write(b'\0' * (-f.tell() % 8))
+        for part in (names, locations, items):
+            f.write(part)
+    os.replace(temporary, cache_name(filename))
+
+
+def read_cache(filename, key):
+    """Reads the cache file for a CSV file, if it's up to date
+
+    The columns are memory-mapped rather than read in.
+
+    :param str filename: The name of the observations CSV file
+
+    :param tuple key: The current fingerprint of the CSV file
+
+    :returns: None if there is no usable cache, otherwise a tuple with
+        the following items:
+
+                - A dictionary that maps a suspect's name to the
+                  item they are currently carrying.
+
+                - A ColumnarTimeline backed by the cache file.
+
+    :rtype: tuple
+    """
+    try:
+        with open(cache_name(filename), 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Missing or empty
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    (magic, size, mtime, digest, count, names_length, locations_length,
+     items_length) = _HEADER.unpack_from(data)
+    if not magic == MAGIC or not (size, mtime, digest) == key:
+        return None
+    # Make sure the file wasn't cut short
+    offset = _HEADER.size + count * 16
+    offset += -offset % 8
+    if not (offset + names_length + locations_length + items_length ==
+            len(data)):
+        return None
+
+    view = memoryview(data)
+    offset = _HEADER.size
+    columns = []
+    for code, width in (('q', 8), ('i', 4), ('i', 4)):
+        columns.append(view[offset:offset + count * width].cast(code))
+        offset += count * width
+    offset += -offset % 8
+    tables = []
+    for length in (names_length, locations_length, items_length):
+        tables.append(_split(data[offset:offset + length]))
+        offset += length
+
+    names, locations, items = tables
+    carrying = dict(item.split(',', 1) for item in items)
+    return (carrying, ColumnarTimeline.from_columns(
+        columns[0], columns[1], columns[2], names, locations))
+
+
+def _join(strings):
+    """Packs strings into bytes, one per line
+
+    :param iterable strings: Strings without newlines
+
+    :rtype: bytes
+    """
+    return ''.join(s + '\n' for s in strings).encode('utf-8')
+
+
+def _split(data):
+    """Unpacks strings packed by _join
+
+    :param bytes data: Packed strings
+
+    :rtype: list
+    """
+    return data.decode('utf-8').split('\n')[:-1]
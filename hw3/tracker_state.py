@@ -0,0 +1,215 @@
+import os
+import pickle
+from bisect import bisect_left
+from datetime import timedelta
+
+from observation import EPOCH
+from observation_timeline import ObservationTimeline
+from ownership import Ownership
+
+# Time keys are whole seconds, so this is one time key's worth
+_SECOND = timedelta(seconds=1)
+
+
+class TrackerState:
+    def __init__(self, window_size=timedelta(0, 3600)):
+        """Constructor for a TrackerState
+
+        Keeps everything worked out from the observations seen so far,
+        so that a new batch of observations only means looking at the
+        windows it could have changed, instead of starting over.
+
+        :param timedelta window_size: timeframe of observations
+
+        :return: None
+        """
+        self.window_size = window_size
+        self.timeline = ObservationTimeline()
+        # Who was carrying what before any exchanges
+        self.initial = {}
+        # Every rendezvous so far in time order, and the time key of
+        # the first observation of each
+        self.rendezvous = []
+        self._heads = []
+        self.ownership = Ownership({})
+        # The state file this was loaded from or saved to, how much of
+        # it is good, and what has changed since: the new carried
+        # items, the new observations in the order they were added, and
+        # how many rendezvous are still the same
+        self._filename = None
+        self._size = 0
+        self._changed = {}
+        self._added = []
+        self._kept = 0
+
+    @classmethod
+    def load(cls, filename):
+        """Reads a TrackerState saved by save()
+
+        The file is a log of pickled (carried items, observations,
+        rendezvous kept, new rendezvous) records, one for each save.
+        Each record's observations are added to the timeline and its
+        rendezvous replace the ones after those kept, so ownership is
+        replayed from the rendezvous rather than stored. A record cut
+        short by a save that never finished is left out, and written
+        over by the next save.
+
+        :param str filename: The name of the state file
+
+        :rtype: TrackerState
+
+        :raises OSError: If there is an issue finding or opening the file
+        """
+        state = cls()
+        with open(filename, 'rb') as f:
+            end = os.fstat(f.fileno()).st_size
+            while state._size < end:
+                try:
+                    changed, observations, kept, found = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                state.initial.update(changed)
+                state.timeline.add_many(observations)
+                del state.rendezvous[kept:]
+                del state._heads[kept:]
+                state.rendezvous.extend(found)
+                state._heads.extend(rend[0].key for rend in found)
+                state._size = f.tell()
+
+        state.ownership = Ownership(dict(state.initial))
+        for first, second in state.rendezvous:
+            state.ownership.exchange(first, second)
+        state._filename = filename
+        state._kept = len(state.rendezvous)
+        return state
+
+    def save(self, filename):
+        """Writes the TrackerState to a file
+
+        Saving back to the file the state was loaded from only appends
+        what has changed since. Any other file gets the whole state.
+
+        :param str filename: The name of the state file
+
+        :return: None
+
+        :raises OSError: If the file cannot be written
+        """
+        if filename == self._filename and os.path.exists(filename):
+            with open(filename, 'r+b') as f:
+                f.seek(self._size)
+                pickle.dump((self._changed, self._added, self._kept,
+                             self.rendezvous[self._kept:]),
+                            f, pickle.HIGHEST_PROTOCOL)
+                f.truncate()
+                self._size = f.tell()
+        else:
+            # Write a whole new file, then swap it in
+            temporary = filename + '.tmp'
+            with open(temporary, 'wb') as f:
+                pickle.dump((self.initial, self.timeline.observations, 0,
+                             self.rendezvous), f, pickle.HIGHEST_PROTOCOL)
+                self._size = f.tell()
+            os.replace(temporary, filename)
+        self._filename = filename
+        self._changed = {}
+        self._added = []
+        self._kept = len(self.rendezvous)
+
+    def update(self, carrying, observations, counts=None, duplicates=None):
+        """Adds a batch of observations
+
+        Observations already in the timeline, such as ones a feed sent
+        again, are left out. Only the windows that start less than
+        window_size before the earliest new observation are looked at
+        again. Ownership is
+        rewound to the first rendezvous that could have changed; the
+        rendezvous from there on are given back so that the caller can
+        replay them through ownership.exchange().
+
+        The windows are only looked at as the rendezvous are asked for,
+        so rendezvous before a crowded window come out before the
+        DataError, as they would from the whole timeline.
+
+        :param dict carrying: Maps the name of each suspect in the
+            batch to the item they are carrying
+
+        :param iterable observations: The batch's observations, in any
+            order
+
+        :param dict counts: Where to count the windows looked at again,
+            if desired. See count_windows().
+
+        :param DuplicateFilter duplicates: Where to count the repeated
+            observations left out, if desired
+
+        :return: An iterator over the rendezvous to replay, in time
+            order
+
+        :rtype: iterator
+
+        :raises DataError: While iterating, if too many observations
+            happen in timeframe. The state is left half updated, and
+            shouldn't be saved.
+        """
+        batch = []
+        seen = set()
+        for o in observations:
+            # Repeats can only be the suspect's own observations at the
+            # same second, which their index finds by binary search
+            if o in seen or o in self.timeline.trajectory(
+                    o.name, o.time, o.time + _SECOND):
+                if duplicates is not None:
+                    duplicates.dropped += 1
+                continue
+            seen.add(o)
+            batch.append(o)
+        if batch:
+            self.timeline.add_many(batch)
+            self._added.extend(batch)
+            # The earliest window that could hold a new observation
+            begin = (min(o.key for o in batch) -
+                     self.window_size.total_seconds())
+            start = EPOCH + timedelta(seconds=begin)
+            first = bisect_left(self._heads, begin)
+            found = self.timeline.rendezvous(self.window_size, start,
+                                             counts=counts)
+            del self.rendezvous[first:]
+            del self._heads[first:]
+            self._kept = min(self._kept, first)
+        else:
+            first = len(self.rendezvous)
+            found = ()
+
+        # Giving someone a different item changes every exchange since
+        # the beginning, but new suspects can just be added
+        changed = {name: item for name, item in carrying.items()
+                   if not self.initial.get(name) == item}
+        self.initial.update(changed)
+        self._changed.update(changed)
+        if any(name in self.ownership.carrying for name in changed):
+            first = 0
+            self.ownership = Ownership(dict(self.initial))
+        else:
+            self.ownership.add_suspects(changed)
+            self.ownership.rewind(min(first, len(self.ownership)))
+        return self._replay(self.rendezvous[first:], found)
+
+    def _replay(self, kept, found):
+        """Gives back the rendezvous to replay, keeping new ones as they
+        are found
+
+        :param list kept: The rendezvous from before that are replayed
+            again
+
+        :param iterable found: The new rendezvous, in time order
+
+        :yield: Each rendezvous in kept, then each in found
+
+        :rtype: tuple
+        """
+        yield from kept
+        for rend in found:
+            self.rendezvous.append(rend)
+            self._heads.append(rend[0].key)
+            yield rend